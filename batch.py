@@ -0,0 +1,194 @@
+"""
+Batch mode: run many prompts through the same routing as get_response.
+
+    python batch.py prompts.txt -o results.jsonl --concurrency 4
+    cat prompts.jsonl | python batch.py - -o results.jsonl --model qwen2.5:3b-instruct
+
+Input is one prompt per line, either plain text or JSON with "prompt" and
+an optional "id". Every prompt gets its own plan_turn() (options, model and
+system prompt, exactly as in the app), is sent without history or recall,
+and its result is appended to the output JSONL as soon as it completes,
+with timing and Ollama's token stats. Items already in the output file with
+status "ok" are skipped, so an interrupted run continues where it stopped
+(failed items are retried and appended again; the last record per id wins).
+"""
+import argparse
+import dataclasses
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from config import OLLAMA_BASE_URL, OLLAMA_POOL_SIZE
+
+BATCH_SESSION = "batch"  # no context is ever stored for it, so items never continue each other
+
+
+def read_items(path):
+    """[(id, prompt)] from a text/JSONL file or '-' for stdin; ids default to the line number."""
+    source = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    items = []
+    try:
+        for number, line in enumerate(source, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item_id, prompt = f"line-{number}", line
+            if line.startswith("{"):
+                try:
+                    data = json.loads(line)
+                    prompt = data["prompt"]
+                    item_id = str(data.get("id", item_id))
+                except (ValueError, KeyError) as e:
+                    print(f"[Batch Error] line {number}: {e!r}", file=sys.stderr)
+                    continue
+            items.append((item_id, prompt))
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    return items
+
+
+def completed_ids(path, retry_errors=True):
+    """Ids already in an earlier output file (only successful ones with retry_errors)."""
+    done = set()
+    if not path or not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut off by the interruption
+            if record.get("status") == "ok" or not retry_errors:
+                done.add(record.get("id"))
+    return done
+
+
+def run_item(brain, item_id, prompt, model=None, options=None, retries=2):
+    """One prompt through plan_turn + /api/generate; never raises, errors end up in the record."""
+    from tracing import Trace
+
+    record = {"id": item_id, "prompt": prompt}
+    for attempt in range(retries + 1):
+        start = time.perf_counter()
+        try:
+            plan = brain.plan_turn(prompt)
+            if model or options:
+                plan = dataclasses.replace(
+                    plan,
+                    model=model or plan.model,
+                    options={**plan.options, **(options or {})},
+                )
+            body = brain.build_generate_request(prompt, [], plan, BATCH_SESSION, stream=False, recall=False)
+            response = brain.CLIENT.post("/api/generate", json=body, timeout=(5, 300))
+            response.raise_for_status()
+            data = response.json()
+            took = time.perf_counter() - start
+            brain.ROUTER.observe(plan.model, data=data)
+            stats = Trace("batch")
+            brain.record_generation(stats, data)
+            text, _ = brain.parse_response(data.get("response", ""))
+            record.update(
+                status="ok",
+                response=text,
+                model=plan.model,
+                options=plan.options,
+                system_prompt="fast" if plan.system_prompt == brain.SYSTEM_PROMPT_FAST else "full",
+                emotion=plan.reply_emotion,
+                e2e_ms=round(took * 1000.0, 3),
+                attempts=attempt + 1,
+                **stats.attrs,
+            )
+            return record
+        except Exception as e:
+            record.update(status="error", error=str(e), attempts=attempt + 1)
+            if attempt < retries:
+                # Lets the client's circuit breaker close again before the retry
+                time.sleep(min(2 ** attempt, 10))
+    return record
+
+
+def run(args):
+    import brain
+
+    # One pooled connection per concurrent request, nothing dropped from the pool
+    brain.use_server(args.url, pool_size=max(args.concurrency, OLLAMA_POOL_SIZE))
+    options = json.loads(args.options) if args.options else None
+
+    items = read_items(args.input)
+    done = completed_ids(args.output, retry_errors=not args.keep_errors) if args.resume else set()
+    todo = [(i, p) for i, p in items if i not in done]
+    print(f"{len(items)} prompts, {len(items) - len(todo)} already done, {len(todo)} to run", file=sys.stderr)
+
+    out = sys.stdout if args.output in (None, "-") else open(args.output, "a" if args.resume else "w", encoding="utf-8")
+    write_lock = threading.Lock()
+    counts = {"ok": 0, "error": 0}
+    interrupted = False
+
+    def write(future):
+        record = future.result()
+        with write_lock:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()  # every finished item survives an interruption
+        counts["ok" if record["status"] == "ok" else "error"] += 1
+
+    started = time.perf_counter()
+    pool = ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="batch")
+    try:
+        futures = [pool.submit(run_item, brain, i, p, args.model, options, args.retries) for i, p in todo]
+        written = set()
+        try:
+            for future in as_completed(futures):
+                write(future)
+                written.add(future)
+        except KeyboardInterrupt:
+            interrupted = True
+            # Queued prompts are dropped; the ones already generating are paid for, so keep them
+            pool.shutdown(wait=False, cancel_futures=True)
+            running = [f for f in futures if f not in written and not f.cancelled()]
+            print(f"Interrupted: finishing {len(running)} running prompts (Ctrl-C again to stop now)",
+                  file=sys.stderr)
+            try:
+                for future in as_completed(running):
+                    write(future)
+            except KeyboardInterrupt:
+                pass
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - started
+    print(f"{counts['ok']} ok, {counts['error']} failed in {elapsed:.1f}s"
+          + (" (interrupted, run again to resume)" if interrupted else ""), file=sys.stderr)
+    if interrupted:
+        raise KeyboardInterrupt
+    return counts["error"]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run prompts through Vi's routing and write JSONL results")
+    ap.add_argument("input", help="prompt file (text or JSONL), '-' for stdin")
+    ap.add_argument("-o", "--output", help="results JSONL (default: stdout)")
+    ap.add_argument("--concurrency", type=int, default=2, help="requests in flight at once")
+    ap.add_argument("--url", default=OLLAMA_BASE_URL, help="Ollama server")
+    ap.add_argument("--model", help="force this model instead of the router's choice")
+    ap.add_argument("--options", help="JSON merged into each turn's generation options")
+    ap.add_argument("--retries", type=int, default=2, help="retries per prompt after an error")
+    ap.add_argument("--no-resume", dest="resume", action="store_false",
+                    help="overwrite the output instead of skipping prompts already in it")
+    ap.add_argument("--keep-errors", action="store_true", help="on resume, do not retry prompts that failed")
+    args = ap.parse_args()
+    if args.resume and args.output in (None, "-"):
+        args.resume = False
+    try:
+        failed = run(args)
+    except KeyboardInterrupt:
+        sys.exit(130)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+End-to-end latency benchmark of the LLM path against a local mock Ollama.
+
+    python bench.py --turns 50 --json bench.json
+    python bench.py --json new.json --compare bench.json
+
+Reports time-to-first-chunk, chunks/sec, p50/p95/p99 end-to-end latency
+and the overhead of our own code (measured time minus the delays the mock
+server was told to add), for stream_response, get_response,
+prewarm_model and the memory.py calls.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from tracing import percentile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def summarize(values, scale=1000.0):
+    """Distribution summary in milliseconds (scale=1000 converts seconds)."""
+    if not values:
+        return {"n": 0}
+    vals = [v * scale for v in values]
+    return {
+        "n": len(vals),
+        "mean": statistics.fmean(vals),
+        "p50": percentile(vals, 50),
+        "p95": percentile(vals, 95),
+        "p99": percentile(vals, 99),
+        "max": max(vals),
+    }
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                             capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def bench_stream(brain, prompts, mock):
+    ttfc, e2e, rates, overhead, chunks_total = [], [], [], [], 0
+    intrinsic_first = mock.first_token_delay
+    for prompt in prompts:
+        start = time.perf_counter()
+        first = None
+        chunks = 0
+        for _ in brain.stream_response(prompt, []):
+            if first is None:
+                first = time.perf_counter()
+            chunks += 1
+        end = time.perf_counter()
+        if first is None:
+            continue
+        chunks_total += chunks
+        ttfc.append(first - start)
+        e2e.append(end - start)
+        if chunks > 1 and end > first:
+            rates.append((chunks - 1) / (end - first))
+        # The mock sleeps first_token_delay, then 1/token_rate between tokens
+        intrinsic = intrinsic_first + (max(chunks - 1, 0) / mock.token_rate if mock.token_rate else 0.0)
+        overhead.append(max(0.0, (end - start) - intrinsic))
+    return {
+        "ttfc_ms": summarize(ttfc),
+        "ttfc_overhead_ms": summarize([max(0.0, t - intrinsic_first) for t in ttfc]),
+        "e2e_ms": summarize(e2e),
+        "overhead_ms": summarize(overhead),
+        "chunks_per_sec": summarize(rates, scale=1.0),
+        "chunks": chunks_total,
+    }
+
+
+def bench_get_response(brain, prompts, mock):
+    e2e, overhead = [], []
+    for prompt in prompts:
+        start = time.perf_counter()
+        brain.get_response(prompt, [])
+        took = time.perf_counter() - start
+        e2e.append(took)
+        intrinsic = mock.first_token_delay + (mock.tokens / mock.token_rate if mock.token_rate else 0.0)
+        overhead.append(max(0.0, took - intrinsic))
+    return {"e2e_ms": summarize(e2e), "overhead_ms": summarize(overhead)}
+
+
+def bench_prewarm(brain, runs, mock):
+    e2e = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        brain.prewarm_model()
+        e2e.append(time.perf_counter() - start)
+    return {"e2e_ms": summarize(e2e), "overhead_ms": summarize([max(0.0, t - mock.first_token_delay) for t in e2e])}
+
+
+def bench_memory(memory, turns):
+    save, history = [], []
+    for i in range(turns):
+        start = time.perf_counter()
+        memory.save_message("user", f"benchmark message {i}")
+        save.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        memory.get_recent_history(10)
+        history.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    memory.flush()
+    flushed = time.perf_counter() - start
+    return {
+        "save_message_ms": summarize(save),
+        "get_recent_history_ms": summarize(history),
+        "flush_ms": flushed * 1000.0,
+    }
+
+
+def run(args):
+    sys.path.insert(0, BASE_DIR)
+    import memory
+    from mock_ollama import MockOllama
+
+    tmp = tempfile.mkdtemp(prefix="vi-bench-")
+    memory.DB_PATH = os.path.join(tmp, "bench.db")
+    memory.init_db()
+
+    import brain
+    import fastpath
+
+    mock = MockOllama(token_rate=args.token_rate, first_token_delay=args.first_token_delay,
+                      tokens=args.tokens, error_rate=args.error_rate,
+                      stream_error_rate=args.stream_error_rate, seed=args.seed).start()
+    try:
+        brain.use_server(mock.url)
+        # Every prompt is unique and not in dataset.csv, so nothing short-circuits the model
+        fastpath.CACHE.max_size = 0
+        prompts = [f"please tell me something about topic number {i}" for i in range(args.turns)]
+        for p in prompts[: args.warmup]:
+            list(brain.stream_response(p + " warmup", []))
+        results = {
+            "stream_response": bench_stream(brain, prompts, mock),
+            "get_response": bench_get_response(brain, prompts[: max(1, args.turns // 2)], mock),
+            "prewarm_model": bench_prewarm(brain, max(1, args.turns // 5), mock),
+            "memory": bench_memory(memory, args.turns),
+        }
+        results["mock"] = {k: v for k, v in mock.stats.items() if k != "queue_wait"}
+    finally:
+        mock.stop()
+        memory.close()
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "label": args.label,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {
+                "turns": args.turns,
+                "token_rate": args.token_rate,
+                "first_token_delay": args.first_token_delay,
+                "tokens": args.tokens,
+                "error_rate": args.error_rate,
+                "stream_error_rate": args.stream_error_rate,
+            },
+        },
+        "results": results,
+    }
+
+
+def _flatten(results, prefix=""):
+    out = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            out.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)):
+            out[name] = value
+    return out
+
+
+def print_report(report, baseline=None):
+    flat = _flatten(report["results"])
+    base = _flatten(baseline["results"]) if baseline else {}
+    print(f"commit={report['meta']['commit']} label={report['meta']['label']}")
+    for name, value in flat.items():
+        if not any(name.endswith(s) for s in (".p50", ".p95", ".p99", ".mean", "flush_ms", ".n")):
+            continue
+        line = f"  {name:<45} {value:>10.3f}"
+        if name in base and base[name]:
+            delta = (value - base[name]) / base[name] * 100.0
+            line += f"   {delta:+7.1f}% vs {baseline['meta'].get('commit')}"
+        print(line)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark brain.py / memory.py against a mock Ollama server")
+    ap.add_argument("--turns", type=int, default=30)
+    ap.add_argument("--warmup", type=int, default=2)
+    ap.add_argument("--token-rate", type=float, default=200.0, help="mock tokens per second")
+    ap.add_argument("--first-token-delay", type=float, default=0.02, help="mock prompt eval time (s)")
+    ap.add_argument("--tokens", type=int, default=40, help="mock reply length")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="share of HTTP 500 replies")
+    ap.add_argument("--stream-error-rate", type=float, default=0.0, help="share of streams with an error frame")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--label", default="")
+    ap.add_argument("--json", help="write machine-readable results here")
+    ap.add_argument("--compare", help="previous --json output to diff against")
+    args = ap.parse_args()
+
+    report = run(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,27 @@
 import json
+import re
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
 import requests
-from config import OLLAMA_BASE_URL, MODEL_NAME, SYSTEM_PROMPT, SYSTEM_PROMPT_FAST, OLLAMA_OPTIONS, STOP_TOKENS, KEEP_ALIVE, FAST_MODE, FAST_OPTIONS
-from memory import get_recent_history
+from requests.adapters import HTTPAdapter
+from config import OLLAMA_BASE_URL, SYSTEM_PROMPT, SYSTEM_PROMPT_FAST, OLLAMA_OPTIONS, STOP_TOKENS, KEEP_ALIVE, FAST_MODE, FAST_OPTIONS
+from config import OLLAMA_POOL_SIZE, OLLAMA_HEALTH_TTL, OLLAMA_BACKOFF_BASE, OLLAMA_BACKOFF_MAX
+from config import RECALL_ENABLED, EMBED_MODEL, RECALL_TOP_K, RECALL_MIN_SCORE
+from config import CONTEXT_REUSE, CONTEXT_REPLY_RESERVE, CONTEXT_SUMMARY_SHARE, CONTEXT_HISTORY_MESSAGES
+from config import WARMUP_ENABLED, WARMUP_DEBOUNCE, WARMUP_MIN_INTERVAL, DEFAULT_SESSION
+import fastpath
+import memory
+from router import ModelRouter
+from tracing import maybe_span
+
+# Fixed replies used when the model cannot answer (plain text, ready to display/speak)
+OFFLINE_REPLY = "Ollama server offline distoy. Thoda velane try kara."
+SERVER_ERROR_REPLY = "Server la thoda issue aala. Thodya velane parat try kara."
+STREAM_ERROR_REPLY = "Thoda issue aala, parat try karu ya!"
+TECH_ISSUE_REPLY = "Arre yaar thoda technical issue aala 😅 Ek minute thaamb na."
+CANNED_REPLIES = (OFFLINE_REPLY, SERVER_ERROR_REPLY, STREAM_ERROR_REPLY, TECH_ISSUE_REPLY)
 
 VALID_EMOTIONS = {"happy", "sad", "neutral", "love", "talk", "question", "smile"}
 EMOTION_MAP = {
@@ -17,12 +37,249 @@ EMOTION_MAP = {
 }
 
 
-def ollama_up(timeout=3):
+class OllamaUnavailable(RuntimeError):
+    """Raised when the circuit breaker is open and Ollama is considered down."""
+
+
+class OllamaClient:
+    """
+    Long-lived Ollama client shared by every turn.
+    - one pooled requests.Session (keep-alive, no per-turn TCP handshake)
+    - health state cached for `health_ttl` seconds and refreshed in the background
+    - circuit breaker: after a failure, calls fail instantly until the backoff expires
+    """
+
+    def __init__(self, base_url, pool_size=4, health_ttl=15.0, backoff_base=1.0, backoff_max=30.0):
+        self.base_url = base_url.rstrip("/")
+        self.health_ttl = health_ttl
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self._healthy = None
+        self._checked_at = 0.0
+        self._failures = 0
+        self._open_until = 0.0
+        self._refreshing = False
+
+    def url(self, path):
+        return f"{self.base_url}{path}"
+
+    # ── circuit breaker ──
+    def record_success(self):
+        with self._lock:
+            self._healthy = True
+            self._checked_at = time.monotonic()
+            self._failures = 0
+            self._open_until = 0.0
+
+    def record_failure(self):
+        with self._lock:
+            now = time.monotonic()
+            self._healthy = False
+            self._checked_at = now
+            self._failures += 1
+            delay = min(self.backoff_max, self.backoff_base * (2 ** (self._failures - 1)))
+            self._open_until = now + delay
+
+    def circuit_open(self):
+        return time.monotonic() < self._open_until
+
+    # ── health ──
+    def check_health(self, timeout=2):
+        """Synchronous probe of /api/tags (the model list itself is kept by ModelRouter)."""
+        try:
+            r = self.session.get(self.url("/api/tags"), timeout=timeout)
+            if not r.ok:
+                self.record_failure()
+                return False
+            self.record_success()
+            return True
+        except Exception:
+            self.record_failure()
+            return False
+
+    def _refresh_in_background(self, timeout):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def _run():
+            try:
+                self.check_health(timeout=timeout)
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=_run, name="ollama-health", daemon=True).start()
+
+    def is_up(self, timeout=2):
+        """
+        Never blocks once a health state is known: a stale or half-open state
+        returns the cached answer and schedules a background refresh.
+        Only the very first call (no state yet) probes synchronously.
+        """
+        if self._healthy is None:
+            return self.check_health(timeout=timeout)
+        if self.circuit_open():
+            return False
+        if time.monotonic() - self._checked_at > self.health_ttl or not self._healthy:
+            self._refresh_in_background(timeout)
+        return self._healthy
+
+    # ── requests ──
+    def request(self, method, path, **kwargs):
+        if self.circuit_open():
+            raise OllamaUnavailable("Ollama circuit open")
+        try:
+            resp = self.session.request(method, self.url(path), **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            self.record_failure()
+            raise
+        if resp.status_code < 500:
+            self.record_success()
+        return resp
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+
+class CancelToken:
+    """
+    Lets another thread abort a turn. cancel() shuts down the socket of the
+    bound streaming response, so the reading thread wakes up at once and
+    Ollama sees the client disconnect and stops generating.
+    """
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._resp = None
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def bind(self, resp):
+        with self._lock:
+            self._resp = resp
+        if self.cancelled:
+            _abort_response(resp)
+
+    def cancel(self):
+        self._cancelled.set()
+        with self._lock:
+            resp = self._resp
+        if resp is not None:
+            _abort_response(resp)
+
+
+def _abort_response(resp):
+    # close() alone does not wake a thread blocked in recv() on Linux; shutdown() does
     try:
-        r = requests.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=timeout)
-        return r.ok
+        sock = getattr(getattr(resp.raw, "connection", None), "sock", None)
+        if sock is not None:
+            sock.shutdown(socket.SHUT_RDWR)
     except Exception:
-        return False
+        pass
+    try:
+        resp.close()
+    except Exception:
+        pass
+
+
+CLIENT = OllamaClient(
+    OLLAMA_BASE_URL,
+    pool_size=OLLAMA_POOL_SIZE,
+    health_ttl=OLLAMA_HEALTH_TTL,
+    backoff_base=OLLAMA_BACKOFF_BASE,
+    backoff_max=OLLAMA_BACKOFF_MAX,
+)
+
+
+def ollama_up(timeout=2):
+    return CLIENT.is_up(timeout=timeout)
+
+
+# Model choice per turn, from installed/loaded models and measured latency
+ROUTER = ModelRouter(CLIENT)
+
+# Long-term memory: every saved message is embedded in the background.
+# The index (and NumPy with it) is built on first use, not at import time,
+# so it stays off the startup path; PrewarmWorker builds it after the window shows.
+SEMANTIC = None
+_semantic_lock = threading.Lock()
+
+
+def get_semantic():
+    global SEMANTIC
+    if SEMANTIC is None:
+        with _semantic_lock:
+            if SEMANTIC is None:
+                from recall import SemanticMemory, OllamaEmbedder
+                SEMANTIC = SemanticMemory(OllamaEmbedder(CLIENT, EMBED_MODEL))
+    return SEMANTIC
+
+
+def _index_saved(role, message, emotion=None, session=DEFAULT_SESSION, row_id=None):
+    get_semantic().add(role, message, emotion, session=session, row_id=row_id)
+
+
+def _clear_index(session=None):
+    # clear_memory() already deleted the vectors with their rows; only a loaded matrix needs rebuilding
+    if SEMANTIC is not None:
+        SEMANTIC.clear(session)
+
+
+def _forget_indexed(ids):
+    # Retention already deleted the vectors; only a loaded matrix needs updating
+    if SEMANTIC is not None:
+        SEMANTIC.forget(ids)
+
+
+if RECALL_ENABLED:
+    memory.on_save(_index_saved)
+memory.on_clear(_clear_index)
+memory.on_clear(fastpath.forget)
+memory.on_delete(_forget_indexed)
+
+
+def use_server(base_url, pool_size=OLLAMA_POOL_SIZE):
+    """Point every Ollama call at another server (benchmarks, mock server, batch runs, tests)."""
+    global CLIENT
+    CLIENT = OllamaClient(
+        base_url,
+        pool_size=pool_size,
+        health_ttl=OLLAMA_HEALTH_TTL,
+        backoff_base=OLLAMA_BACKOFF_BASE,
+        backoff_max=OLLAMA_BACKOFF_MAX,
+    )
+    ROUTER.client = CLIENT
+    ROUTER.invalidate()
+    reset_context()  # context tokens belong to the old server's model state
+    if SEMANTIC is not None and hasattr(SEMANTIC.embedder, "client"):
+        SEMANTIC.embedder.client = CLIENT
+    return CLIENT
+
+
+def recall_related(user_input, history, session=DEFAULT_SESSION):
+    """Past messages of this session relevant to the turn and not already in `history`."""
+    if not RECALL_ENABLED:
+        return []
+    try:
+        exclude = {m["message"] for m in history or []}
+        exclude.add(user_input)
+        return get_semantic().search(user_input, k=RECALL_TOP_K, min_score=RECALL_MIN_SCORE, exclude=exclude, session=session)
+    except Exception as e:
+        print(f"[Recall Error] {e}")
+        return []
 
 def parse_response(raw_text):
     text = raw_text.strip()
@@ -30,56 +287,125 @@ def parse_response(raw_text):
     return text, emotion
 
 
-def detect_emotion_from_user(user_text):
-    txt = (user_text or "").lower()
-    # Question/ask detection (map to 'question' so UI shows explain GIF)
-    question_signals = [
-        "?", "what", "why", "how", "when", "where", "who", "which",
-        "काय", "का", "कधी", "कुठे", "कोण", "कसा", "कशी", "काय करु", "काय करू",
-    ]
-    if any(k in txt for k in question_signals):
+# ──────────────────────────────────────────────
+# 🔎 Turn analysis: every keyword list, one scan per turn
+# ──────────────────────────────────────────────
+# Question/ask detection (map to 'question' so UI shows explain GIF)
+QUESTION_SIGNALS = [
+    "?", "what", "why", "how", "when", "where", "who", "which",
+    "काय", "का", "कधी", "कुठे", "कोण", "कसा", "कशी", "काय करु", "काय करू",
+]
+POSITIVE_SIGNALS = [
+    "happy", "great", "awesome", "nice", "good", "thanks", "thank you", "love",
+    "mast", "khush", "आनंदी", "खुश", "छान", "भारी",
+    "😍", "😊", "🙂", "❤️", "💙", "👍",
+]
+SAD_SIGNALS = [
+    "sad", "upset", "down", "cry", "lonely", "alone", "depressed", "hurt",
+    "dukh", "dukhi", "दुख", "दुःखी", "एकटा", "एकटी", "रडतो", "रडते",
+    "😢", "🥺", "💔",
+]
+ANGER_SIGNALS = [
+    "angry", "frustrated", "irritated", "mad", "annoyed", "furious", "rage",
+    "raga", "राग", "चिडलो", "चिडली",
+    "😡", "🤬",
+]
+ANXIOUS_SIGNALS = [
+    "anxious", "anxiety", "tension", "stress", "confused", "worry", "panic",
+    "तणाव", "चिंता", "गोंधळ", "भीती",
+    "😰", "😟",
+]
+LOVE_SIGNALS = [
+    "miss you", "need friend", "need someone", "love you", "love", "care",
+    "एकटा वाटतं", "सोबत", "प्रेम", "मायेची गरज",
+    "❤️", "🤗",
+]
+# Long answer wanted: bigger model + full system prompt
+LONG_SIGNALS = [
+    "detail", "explain", "steps", "why", "how", "full", "long",
+    "samjhau", "samjhav", "समजाव", "उदाहरण", "example", "guide",
+]
+# Generation budget also grows for study requests
+DETAIL_SIGNALS = LONG_SIGNALS + [
+    "study", "homework", "definition", "notes", "formula", "solve", "practice",
+]
+# Study turns get a neutral reply emotion and the 'smile' visual
+STUDY_WORDS = [
+    "study", "homework", "definition", "notes", "formula", "solve", "practice",
+    "explain", "steps", "how", "why",
+]
+LONG_TEXT_CHARS = 120
+
+
+def _trie_pattern(words):
+    """Regex alternation factored as a trie (longest keyword wins at each position)."""
+    trie = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        alts = [re.escape(ch) + build(sub) for ch, sub in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = "(?:" + "|".join(alts) + ")"
+        return body + "?" if "" in node else body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """
+    All keyword groups compiled into one regex. A zero-width lookahead is
+    tried at every position, so a single scan finds every keyword that
+    occurs; keywords that are a prefix of the one matched at a position are
+    added from a precomputed table. The result is the same as testing
+    `k in text` for every keyword, in one pass.
+    """
+
+    def __init__(self, groups):
+        self.groups = {name: frozenset(words) for name, words in groups.items()}
+        keywords = sorted(set().union(*self.groups.values()))
+        self._regex = re.compile("(?=(" + _trie_pattern(keywords) + "))")
+        self._prefixes = {k: [p for p in keywords if k.startswith(p)] for k in keywords}
+
+    def scan(self, text):
+        found = set()
+        for m in self._regex.finditer(text):
+            kw = m.group(1)
+            if kw not in found:
+                found.update(self._prefixes[kw])
+        return found
+
+
+ANALYZER = KeywordMatcher({
+    "question": QUESTION_SIGNALS,
+    "positive": POSITIVE_SIGNALS,
+    "sad": SAD_SIGNALS,
+    "anger": ANGER_SIGNALS,
+    "anxious": ANXIOUS_SIGNALS,
+    "love": LOVE_SIGNALS,
+    "long": LONG_SIGNALS,
+    "detail": DETAIL_SIGNALS,
+    "study": STUDY_WORDS,
+})
+
+
+def _hits(found, group):
+    return len(found & ANALYZER.groups[group])
+
+
+def _emotion_from(found, txt):
+    if _hits(found, "question"):
         return "question"
-    pos = [
-        "happy", "great", "awesome", "nice", "good", "thanks", "thank you", "love",
-        "mast", "khush", "आनंदी", "खुश", "छान", "भारी",
-        "😍", "😊", "🙂", "❤️", "💙", "👍",
-    ]
-    neg_sad = [
-        "sad", "upset", "down", "cry", "lonely", "alone", "depressed", "hurt",
-        "dukh", "dukhi", "दुख", "दुःखी", "एकटा", "एकटी", "रडतो", "रडते",
-        "😢", "🥺", "💔",
-    ]
-    anger = [
-        "angry", "frustrated", "irritated", "mad", "annoyed", "furious", "rage",
-        "raga", "राग", "चिडलो", "चिडली",
-        "😡", "🤬",
-    ]
-    anxious_confused = [
-        "anxious", "anxiety", "tension", "stress", "confused", "worry", "panic",
-        "तणाव", "चिंता", "गोंधळ", "भीती",
-        "😰", "😟",
-    ]
-    love_lonely = [
-        "miss you", "need friend", "need someone", "love you", "love", "care",
-        "एकटा वाटतं", "सोबत", "प्रेम", "मायेची गरज",
-        "❤️", "🤗",
-    ]
-    score = {"happy": 0, "sad": 0, "neutral": 0, "love": 0}
-    for w in pos:
-        if w in txt:
-            score["happy"] += 2
-    for w in neg_sad:
-        if w in txt:
-            score["sad"] += 2
-    for w in anger:
-        if w in txt:
-            score["neutral"] += 2
-    for w in anxious_confused:
-        if w in txt:
-            score["neutral"] += 1
-    for w in love_lonely:
-        if w in txt:
-            score["love"] += 2
+    score = {
+        "happy": 2 * _hits(found, "positive"),
+        "sad": 2 * _hits(found, "sad"),
+        "neutral": 2 * _hits(found, "anger") + _hits(found, "anxious"),
+        "love": 2 * _hits(found, "love"),
+    }
     exclaim = txt.count("!") > 0
     if exclaim:
         if score["happy"] > 0:
@@ -92,29 +418,264 @@ def detect_emotion_from_user(user_text):
     return top[0]
 
 
-def build_prompt(user_input, history):
+def detect_emotion_from_user(user_text):
+    txt = (user_text or "").lower()
+    return _emotion_from(ANALYZER.scan(txt), txt)
+
+
+@dataclass
+class TurnPlan:
+    """Everything decided from the user's text, computed once per turn."""
+    user_input: str
+    is_long: bool        # model choice + system prompt
+    is_detailed: bool    # generation options (long or study request)
+    is_study: bool
+    emotion: str         # detected from the user's text
+    options: dict
+    model: str
+    system_prompt: str
+
+    @property
+    def reply_emotion(self):
+        return "neutral" if self.is_study else self.emotion
+
+    @property
+    def visual_emotion(self):
+        """Emotion shown by the character while speaking."""
+        if self.is_study:
+            return "smile"
+        return self.emotion if self.emotion != "neutral" else "talk"
+
+
+def plan_turn(user_input):
+    txt = (user_input or "").lower()
+    found = ANALYZER.scan(txt)
+    is_long = bool(_hits(found, "long")) or len(txt) > LONG_TEXT_CHARS
+    is_detailed = bool(_hits(found, "detail")) or len(txt) > LONG_TEXT_CHARS
+    return TurnPlan(
+        user_input=user_input,
+        is_long=is_long,
+        is_detailed=is_detailed,
+        is_study=bool(_hits(found, "study")),
+        emotion=_emotion_from(found, txt),
+        options=_options_for(user_input, is_detailed),
+        model=_model_for(is_long),
+        system_prompt=SYSTEM_PROMPT_FAST if (FAST_MODE and not is_long) else SYSTEM_PROMPT,
+    )
+
+
+def build_prompt(user_input, history, related=None, summary=None):
     """
     Combine system prompt + history + new input
+    related: relevant older messages from semantic memory (optional)
+    summary: short digest of turns too old to fit verbatim (optional)
     """
     conversation = ""
 
+    if summary:
+        conversation += f"Earlier in this conversation:\n{summary}\n\n"
+
     for msg in history:
         role = "User" if msg["role"] == "user" else "Assistant"
         conversation += f"{role}: {msg['message']}\n"
 
+    # After the history, so summary + history stay a stable prefix that
+    # Ollama can keep cached between turns (see warm_prefix)
+    if related:
+        conversation += "\nRelevant earlier conversation:\n"
+        for msg in related:
+            role = "User" if msg["role"] == "user" else "Assistant"
+            conversation += f"- {role}: {msg['message']}\n"
+        conversation += "\n"
+
     conversation += f"User: {user_input}\nAssistant:"
 
     return conversation
 
 
-def decide_options(user_input):
-    text = (user_input or "").lower()
-    long_signals = [
-        "detail", "explain", "steps", "why", "how", "full", "long",
-        "samjhau", "samjhav", "समजाव", "उदाहरण", "example", "guide",
-        "study", "homework", "definition", "notes", "formula", "solve", "practice",
-    ]
-    is_long = any(k in text for k in long_signals) or len(text) > 120
+# ──────────────────────────────────────────────
+# 🗂 Conversation context
+# Ollama returns `context` (the token ids of prompt + reply) with the final
+# frame. Sending it back with the next turn lets the server reuse the KV
+# cache for everything before the new message, so prompt evaluation only
+# covers the new text. When it cannot be reused (other model or system
+# prompt, or it would overflow num_ctx) the prompt is rebuilt from history,
+# packed into the token budget.
+# ──────────────────────────────────────────────
+CHARS_PER_TOKEN = 4       # rough estimate, good enough for budgeting
+SUMMARY_LINE_CHARS = 120
+CARRY_MAX_TURNS = 4
+
+
+def estimate_tokens(text):
+    return (len(text or "") + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _message_line(msg):
+    role = "User" if msg["role"] == "user" else "Assistant"
+    return f"{role}: {msg['message']}\n"
+
+
+@dataclass
+class ConversationState:
+    model: str
+    system_prompt: str
+    num_ctx: int
+    context: list
+    carry: list = field(default_factory=list)  # (user, reply) turns answered without the model
+
+
+_SESSIONS = {}
+_sessions_lock = threading.Lock()
+
+
+def reset_context(session=None):
+    """Forget cached context for one session, or for all of them."""
+    with _sessions_lock:
+        if session is None:
+            _SESSIONS.clear()
+        else:
+            _SESSIONS.pop(session, None)
+
+
+def note_turn(session, user_input, reply):
+    """A turn answered outside the model (fast path); it is replayed as text on the next continuation."""
+    with _sessions_lock:
+        state = _SESSIONS.get(session)
+        if state is not None:
+            state.carry.append((user_input, reply))
+            del state.carry[:-CARRY_MAX_TURNS]
+
+
+def remember_context(session, plan, data):
+    """Keep the `context` from a finished /api/generate reply for the next turn."""
+    if not CONTEXT_REUSE or not data or not data.get("context"):
+        return
+    with _sessions_lock:
+        _SESSIONS[session] = ConversationState(
+            model=plan.model,
+            system_prompt=plan.system_prompt,
+            num_ctx=plan.options.get("num_ctx", 2048),
+            context=list(data["context"]),
+        )
+
+
+def _reply_reserve(options):
+    num_predict = options.get("num_predict", -1)
+    return num_predict if isinstance(num_predict, int) and num_predict > 0 else CONTEXT_REPLY_RESERVE
+
+
+def summarize_turns(messages, budget):
+    """
+    Extractive digest of old messages: the first sentence of each, newest
+    first until `budget` tokens are used, returned in chronological order.
+    """
+    lines = []
+    used = 0
+    for msg in reversed(messages):
+        text = " ".join((msg.get("message") or "").split())
+        sentence = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0][:SUMMARY_LINE_CHARS]
+        if not sentence:
+            continue
+        line = f"- {'User' if msg['role'] == 'user' else 'Assistant'}: {sentence}"
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(reversed(lines))
+
+
+def pack_history(history, budget):
+    """
+    Fit history into `budget` tokens: newest messages verbatim, the older
+    ones folded into a summary. Returns (messages, summary).
+    """
+    msgs = list(history or [])
+    costs = [estimate_tokens(_message_line(m)) for m in msgs]
+    if sum(costs) <= budget:
+        return msgs, ""
+    summary_budget = int(budget * CONTEXT_SUMMARY_SHARE)
+    used = 0
+    start = len(msgs)
+    while start > 0 and used + costs[start - 1] <= budget - summary_budget:
+        start -= 1
+        used += costs[start]
+    return msgs[start:], summarize_turns(msgs[:start], summary_budget)
+
+
+def _continuation(session, plan, prompt):
+    """The session's context if the new prompt can be appended to it, else None."""
+    if not CONTEXT_REUSE:
+        return None
+    with _sessions_lock:
+        state = _SESSIONS.get(session)
+        if state is None:
+            return None
+        num_ctx = plan.options.get("num_ctx", 2048)
+        if (state.model, state.system_prompt, state.num_ctx) != (plan.model, plan.system_prompt, num_ctx):
+            return None
+        if len(state.context) + estimate_tokens(prompt) + _reply_reserve(plan.options) > num_ctx:
+            return None
+        return state
+
+
+def build_generate_request(user_input, history, plan, session=DEFAULT_SESSION, trace=None, stream=True,
+                           recall=True):
+    """
+    JSON body for /api/generate. Continues from the session's cached context
+    when possible (only the new turn is sent), otherwise packs system prompt
+    + recall + history into num_ctx. Shared by the desktop app and server.py.
+    """
+    history = list(history or [])
+    # The caller has usually saved the user's message already
+    if history and history[-1]["role"] == "user" and history[-1]["message"].strip() == (user_input or "").strip():
+        history.pop()
+    body = {
+        "model": plan.model,
+        "stream": stream,
+        "options": plan.options,
+        "keep_alive": KEEP_ALIVE,
+    }
+
+    with _sessions_lock:
+        state = _SESSIONS.get(session)
+        carry = [] if state is None else [
+            {"role": role, "message": text} for turn in state.carry for role, text in zip(("user", "assistant"), turn)
+        ]
+    with maybe_span(trace, "prompt_build"):
+        prompt = build_prompt(user_input, carry)
+        state = _continuation(session, plan, prompt)
+    if state is not None:
+        # The system prompt is already inside the cached context
+        body.update(prompt=prompt, context=state.context)
+        if trace is not None:
+            trace.set(context_mode="continue", context_tokens=len(state.context))
+        return body
+
+    with maybe_span(trace, "recall"):
+        related = recall_related(user_input, history, session) if recall else []
+    with maybe_span(trace, "prompt_build"):
+        num_ctx = plan.options.get("num_ctx", 2048)
+        fixed = build_prompt(user_input, [], related)
+        budget = num_ctx - _reply_reserve(plan.options) - estimate_tokens(plan.system_prompt) - estimate_tokens(fixed)
+        kept, summary = pack_history(history, max(budget, 0))
+        prompt = build_prompt(user_input, kept, related, summary)
+    body.update(prompt=prompt, system=plan.system_prompt)
+    if trace is not None:
+        trace.set(context_mode="packed", history_kept=len(kept), history_summarized=len(history) - len(kept))
+    return body
+
+
+def decide_options(user_input, plan=None):
+    if plan is not None:
+        return plan.options
+    txt = (user_input or "").lower()
+    is_detailed = bool(_hits(ANALYZER.scan(txt), "detail")) or len(txt) > LONG_TEXT_CHARS
+    return _options_for(user_input, is_detailed)
+
+
+def _options_for(user_input, is_long):
     opts = dict(FAST_OPTIONS if FAST_MODE and not is_long else OLLAMA_OPTIONS)
     if is_long:
         if opts.get("num_predict", 60) != -1:
@@ -136,133 +697,135 @@ def decide_options(user_input):
     return opts
 
 
-AVAILABLE_MODELS = None
-
 def list_available_models():
-    global AVAILABLE_MODELS
-    if AVAILABLE_MODELS is not None:
-        return AVAILABLE_MODELS
-    try:
-        r = requests.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=3)
-        if r.ok:
-            data = r.json()
-            AVAILABLE_MODELS = [m.get("name") for m in data.get("models", []) if m.get("name")]
-        else:
-            AVAILABLE_MODELS = []
-    except Exception:
-        AVAILABLE_MODELS = []
-    return AVAILABLE_MODELS
-
-
-def decide_model(user_input):
-    text = (user_input or "").lower()
-    long_signals = [
-        "detail", "explain", "steps", "why", "how", "full", "long",
-        "samjhau", "samjhav", "समजाव", "उदाहरण", "example", "guide",
-    ]
-    is_long = any(k in text for k in long_signals) or len(text) > 120
-    available = set(list_available_models())
-    if FAST_MODE and not is_long:
-        if "gemma3:1b" in available:
-            return "gemma3:1b"
-        if "qwen2.5:3b-instruct" in available:
-            return "qwen2.5:3b-instruct"
-        return MODEL_NAME
-    else:
-        if "qwen2.5:3b-instruct" in available:
-            return "qwen2.5:3b-instruct"
-        return MODEL_NAME
+    """Installed Ollama models (refreshed by the router every ROUTER_MODELS_TTL seconds)."""
+    return ROUTER.models()
+
+
+def decide_model(user_input, plan=None):
+    if plan is not None:
+        return plan.model
+    txt = (user_input or "").lower()
+    is_long = bool(_hits(ANALYZER.scan(txt), "long")) or len(txt) > LONG_TEXT_CHARS
+    return _model_for(is_long)
+
+
+def _model_for(is_long):
+    return ROUTER.choose(is_long)
 
 
-def get_response(user_input, history=None):
+def record_generation(trace, data):
+    """Copy Ollama's timing fields from the final frame into the trace."""
+    if trace is None or not data:
+        return
+    ns = 1e-6
+    eval_count = data.get("eval_count")
+    eval_duration = data.get("eval_duration")
+    trace.set(
+        prompt_eval_count=data.get("prompt_eval_count"),
+        prompt_eval_ms=round((data.get("prompt_eval_duration") or 0) * ns, 3),
+        eval_count=eval_count,
+        eval_ms=round((eval_duration or 0) * ns, 3),
+        load_ms=round((data.get("load_duration") or 0) * ns, 3),
+        tokens_per_sec=round(eval_count / (eval_duration / 1e9), 2) if eval_count and eval_duration else None,
+    )
+
+
+def get_response(user_input, history=None, plan=None, trace=None, session=DEFAULT_SESSION):
     try:
-        if not ollama_up(timeout=2):
+        if plan is None:
+            with maybe_span(trace, "fastpath"):
+                instant = fastpath.lookup(user_input, session)
+            if instant is not None:
+                text, emotion, source = instant
+                if trace is not None:
+                    trace.set(source=source)
+                note_turn(session, user_input, text)
+                return text, (emotion or detect_emotion_from_user(user_input))
+        with maybe_span(trace, "health_check"):
+            up = ollama_up(timeout=2)
+        if not up:
             raise RuntimeError("Ollama server not reachable")
         if history is None:
-            history = get_recent_history(2)
-
-        prompt = build_prompt(user_input, history)
-        options = decide_options(user_input)
-        text = (user_input or "").lower()
-        long_signals = [
-            "detail", "explain", "steps", "why", "how", "full", "long",
-            "samjhau", "samjhav", "समजाव", "उदाहरण", "example", "guide",
-        ]
-        is_long = any(k in text for k in long_signals) or len(text) > 120
-        sys_prompt = SYSTEM_PROMPT_FAST if (FAST_MODE and not is_long) else SYSTEM_PROMPT
-        model_name = decide_model(user_input)
+            with maybe_span(trace, "history"):
+                history = memory.get_recent_history(CONTEXT_HISTORY_MESSAGES, session)
+        plan = plan or plan_turn(user_input)
 
-        session = requests.Session()
-        response = session.post(
-            f"{OLLAMA_BASE_URL}/api/generate",
-            json={
-                "model": model_name,
-                "prompt": prompt,
-                "stream": False,
-                "options": options,
-                "system": sys_prompt,
-                "keep_alive": KEEP_ALIVE,
-            },
-            timeout=(5, 60),
-        )
-        response.raise_for_status()
+        body = build_generate_request(user_input, history, plan, session, trace, stream=False)
+        if trace is not None:
+            trace.set(model=plan.model, options=plan.options, source="model")
+
+        with maybe_span(trace, "generate.total"):
+            response = CLIENT.post("/api/generate", json=body, timeout=(5, 60))
+            response.raise_for_status()
+            data = response.json()
+        record_generation(trace, data)
+        remember_context(session, plan, data)
+        ROUTER.observe(plan.model, data=data)
 
-        raw_text = response.json()["response"]
+        raw_text = data["response"]
 
         resp_text, _ = parse_response(raw_text)
-        study_words = [
-            "study", "homework", "definition", "notes", "formula", "solve", "practice",
-            "explain", "steps", "how", "why",
-        ]
-        is_study = any(w in (user_input or "").lower() for w in study_words)
-        return resp_text, ("neutral" if is_study else detect_emotion_from_user(user_input))
+        fastpath.remember(user_input, resp_text, session)
+        return resp_text, plan.reply_emotion
 
     except Exception as e:
         print(f"[Brain Error] {e}")
-        return (
-            "Arre yaar thoda technical issue aala 😅 Ek minute thaamb na.",
-            "neutral",
-        )
+        if trace is not None:
+            trace.set(error=str(e))
+        return TECH_ISSUE_REPLY, "neutral"
 
 
-def stream_response(user_input, history=None):
+def stream_response(user_input, history=None, plan=None, trace=None, cancel=None, session=DEFAULT_SESSION):
+    """
+    Yield the reply chunk by chunk.
+    plan: TurnPlan from plan_turn(); computed here if the caller has none.
+    trace: tracing.Trace that receives the per-stage spans (optional).
+    cancel: CancelToken; once cancelled the HTTP stream is closed and the
+            generator ends quietly (no error reply).
+    session: conversation whose Ollama context is continued.
+    """
     try:
-        if not ollama_up(timeout=2):
-            yield '{"response":"Ollama server offline distoy. Thoda velane try kara.","emotion":"neutral"}'
+        # Canned dataset answers and recently generated replies skip the model
+        with maybe_span(trace, "fastpath"):
+            instant = fastpath.lookup(user_input, session)
+        if instant is not None:
+            if trace is not None:
+                trace.set(source=instant[2])
+            note_turn(session, user_input, instant[0])
+            yield instant[0]
+            return
+        with maybe_span(trace, "health_check"):
+            up = ollama_up(timeout=2)
+        if not up:
+            if trace is not None:
+                trace.set(source="offline")
+            yield OFFLINE_REPLY
             return
         if history is None:
-            history = get_recent_history(2)
-        prompt = build_prompt(user_input, history)
-        options = decide_options(user_input)
-        text = (user_input or "").lower()
-        long_signals = [
-            "detail", "explain", "steps", "why", "how", "full", "long",
-            "samjhau", "samjhav", "समजाव", "उदाहरण", "example", "guide",
-        ]
-        is_long = any(k in text for k in long_signals) or len(text) > 120
-        sys_prompt = SYSTEM_PROMPT_FAST if (FAST_MODE and not is_long) else SYSTEM_PROMPT
-        model_name = decide_model(user_input)
-        session = requests.Session()
+            with maybe_span(trace, "history"):
+                history = memory.get_recent_history(CONTEXT_HISTORY_MESSAGES, session)
+        plan = plan or plan_turn(user_input)
+        body = build_generate_request(user_input, history, plan, session, trace, stream=True)
+        if trace is not None:
+            trace.set(model=plan.model, options=plan.options, source="model")
         emitted = False
-        with session.post(
-            f"{OLLAMA_BASE_URL}/api/generate",
-            json={
-                "model": model_name,
-                "prompt": prompt,
-                "stream": True,
-                "options": options,
-                "system": sys_prompt,
-                "keep_alive": KEEP_ALIVE,
-            },
-            stream=True,
-            timeout=(5, 120),
-        ) as resp:
+        completed = False
+        parts = []
+        if cancel is not None and cancel.cancelled:
+            return
+        gen_start = time.perf_counter()
+        with CLIENT.post("/api/generate", json=body, stream=True, timeout=(5, 120)) as resp:
+            if cancel is not None:
+                cancel.bind(resp)
             if resp.status_code != 200:
                 try:
                     print(f"[Stream HTTP Error] {resp.status_code} {resp.text}")
                 except Exception:
                     pass
-                yield '{"response":"Server la thoda issue aala. Thodya velane parat try kara.","emotion":"neutral"}'
+                if trace is not None:
+                    trace.set(error=f"HTTP {resp.status_code}")
+                yield SERVER_ERROR_REPLY
                 return
             for line in resp.iter_lines(decode_unicode=True):
                 if not line:
@@ -276,32 +839,58 @@ def stream_response(user_input, history=None):
                         print(f"[Stream Error] {data['error']}")
                     except Exception:
                         pass
+                    if trace is not None:
+                        trace.set(error=data["error"])
                     continue
                 chunk = data.get("response", "")
                 if chunk:
+                    if not emitted:
+                        first_token_at = time.perf_counter()
+                        if trace is not None:
+                            trace.add_span("generate.first_token", gen_start, first_token_at)
+                    parts.append(chunk)
                     yield chunk
                     emitted = True
                 if data.get("done", False):
+                    completed = True
+                    record_generation(trace, data)
+                    remember_context(session, plan, data)
+                    ROUTER.observe(plan.model, first_token_at - gen_start if emitted else None, data)
                     break
+        if cancel is not None and cancel.cancelled:
+            if trace is not None:
+                trace.set(cancelled=True)
+            return
+        if trace is not None:
+            trace.add_span("generate.total", gen_start, chunks=len(parts))
+        if completed and emitted:
+            fastpath.remember(user_input, "".join(parts), session)
         if not emitted:
-            r, emo = get_response(user_input, history)
+            r, emo = get_response(user_input, history, plan, trace, session)
             yield r
     except Exception as e:
+        if cancel is not None and cancel.cancelled:
+            # Connection was closed on purpose by a newer turn
+            if trace is not None:
+                trace.set(cancelled=True)
+            return
         try:
             print(f"[Stream Exception] {e}")
         except Exception:
             pass
-        yield '{"response":"Thoda issue aala, parat try karu ya!","emotion":"neutral"}'
+        if trace is not None:
+            trace.set(error=str(e))
+        yield STREAM_ERROR_REPLY
 
 
-def prewarm_model():
+def prewarm_model(model_name=None):
+    """Load the model into Ollama with a 1-token generation. True when it answered."""
     try:
         if not ollama_up(timeout=2):
-            return
-        model_name = decide_model("hello")
-        session = requests.Session()
-        session.post(
-            f"{OLLAMA_BASE_URL}/api/generate",
+            return False
+        model_name = model_name or decide_model("hello")
+        r = CLIENT.post(
+            "/api/generate",
             json={
                 "model": model_name,
                 "prompt": "User: hello\nAssistant:",
@@ -312,5 +901,103 @@ def prewarm_model():
             },
             timeout=(5, 30),
         )
+        if r.ok:
+            ROUTER.mark_loaded(model_name)
+        return r.ok
     except Exception:
-        pass
+        return False
+
+
+# A long turn that found the large model cold gets the small one; load the large one meanwhile
+ROUTER.on_cold = lambda model: threading.Thread(target=prewarm_model, args=(model,), name="router-warm", daemon=True).start()
+
+
+# ──────────────────────────────────────────────
+# ⌨️ Type-ahead warmup
+# While the user types, send the prefix the next request will start with
+# (system prompt + history, or the cached context) with num_predict=1.
+# Ollama loads the model if it was evicted and keeps the evaluated prefix
+# in its KV cache, so on Enter only the new message is left to process.
+# ──────────────────────────────────────────────
+class PrefixWarmer:
+    def __init__(self, debounce=WARMUP_DEBOUNCE, min_interval=WARMUP_MIN_INTERVAL, send=None):
+        self.debounce = debounce
+        self.min_interval = min_interval
+        # send(body) -> bool replaces the direct POST; server.py routes warmups
+        # through its generation slots with it (and skips them when none is free)
+        self.send = send
+        self._timers = {}    # session -> pending Timer; sessions never cancel each other's warmup
+        self._warmed = {}    # prefix key -> monotonic time it was last sent
+        self._lock = threading.Lock()
+
+    def schedule(self, partial_text, session=DEFAULT_SESSION):
+        """Warm after `debounce` seconds without another call for this session (each keystroke restarts the wait)."""
+        with self._lock:
+            timer = self._timers.get(session)
+            if timer is not None:
+                timer.cancel()
+            timer = threading.Timer(self.debounce, self._run, args=(partial_text, session))
+            timer.daemon = True
+            self._timers[session] = timer
+            timer.start()
+
+    def cancel(self, session=None):
+        """Drop the pending warmup of one session (None: every session)."""
+        with self._lock:
+            if session is None:
+                timers, self._timers = list(self._timers.values()), {}
+            else:
+                timer = self._timers.pop(session, None)
+                timers = [timer] if timer is not None else []
+        for timer in timers:
+            timer.cancel()
+
+    def _run(self, partial_text, session):
+        with self._lock:
+            if self._timers.get(session) is threading.current_thread():
+                del self._timers[session]
+        try:
+            self.warm_now(partial_text, session)
+        except Exception as e:
+            print(f"[Warmup Error] {e}")
+
+    def warm_now(self, partial_text, session=DEFAULT_SESSION):
+        """Send the warmup request unless this exact prefix was warmed recently. Returns True if sent."""
+        if not ollama_up(timeout=2):
+            return False
+        partial_text = partial_text or ""
+        plan = plan_turn(partial_text)
+        history = memory.get_recent_history(CONTEXT_HISTORY_MESSAGES, session)
+        body = build_generate_request(partial_text, history, plan, session, stream=False, recall=False)
+        tail = f"User: {partial_text}\nAssistant:"
+        if not body["prompt"].endswith(tail):
+            return False
+        # Stop right before the user's message: everything up to here is shared with the real turn
+        body["prompt"] = body["prompt"][:-len(tail)] + "User:"
+        body["options"] = dict(body["options"], num_predict=1)
+        key = (session, body["model"], body.get("system"), len(body.get("context") or ()), hash(body["prompt"]))
+        now = time.monotonic()
+        with self._lock:
+            if now - self._warmed.get(key, -self.min_interval) < self.min_interval:
+                return False
+            self._warmed = {k: t for k, t in self._warmed.items() if now - t < self.min_interval}
+            self._warmed[key] = now
+        if self.send is not None:
+            ok = self.send(body)
+        else:
+            ok = CLIENT.post("/api/generate", json=body, timeout=(5, 60)).ok
+        if ok:
+            ROUTER.mark_loaded(body["model"])
+        else:
+            with self._lock:
+                self._warmed.pop(key, None)  # skipped or failed: the next pause may try again
+        return ok
+
+
+WARMER = PrefixWarmer()
+
+
+def warm_prefix(partial_text, session=DEFAULT_SESSION):
+    """Typing activity from the UI: warm the model + prompt prefix (debounced, non-blocking)."""
+    if WARMUP_ENABLED:
+        WARMER.schedule(partial_text, session)
@@ -1,3 +1,5 @@
+import os
+
 # ──────────────────────────────────────────────
 # 🤖 Ollama Configuration (Local AI — No API key needed!)
 OLLAMA_BASE_URL = "http://localhost:11434"
@@ -19,6 +21,116 @@ FAST_OPTIONS = {
 }
 STOP_TOKENS = []
 KEEP_ALIVE = "10m"
+OLLAMA_POOL_SIZE = 4        # keep-alive connections kept open to Ollama
+OLLAMA_HEALTH_TTL = 15.0    # seconds a health check result is trusted
+OLLAMA_BACKOFF_BASE = 1.0   # circuit breaker: first backoff after a failure (s)
+OLLAMA_BACKOFF_MAX = 30.0   # circuit breaker: backoff cap (s)
+
+# ──────────────────────────────────────────────
+# 🧭 Model routing (router.py)
+# ──────────────────────────────────────────────
+ROUTER_SMALL_MODEL = "gemma3:1b"              # short / casual turns
+ROUTER_LARGE_MODEL = "qwen2.5:3b-instruct"    # long / detailed turns, when fast enough
+ROUTER_TTFT_TARGET = 1.5          # seconds to first token before the large model is skipped
+ROUTER_MIN_TOKENS_PER_SEC = 8.0   # slower than this and the large model is skipped
+ROUTER_MODELS_TTL = 30.0          # seconds the installed/loaded model lists are trusted
+ROUTER_RETRY_AFTER = 120.0        # seconds before a degraded model is tried again
+ROUTER_EWMA_ALPHA = 0.3           # weight of the newest latency sample
+
+# ──────────────────────────────────────────────
+# 🗂 Conversation context (reuse Ollama's KV cache between turns)
+# ──────────────────────────────────────────────
+CONTEXT_REUSE = True
+CONTEXT_REPLY_RESERVE = 512        # tokens kept free for the reply when num_predict is -1
+CONTEXT_SUMMARY_SHARE = 0.25       # share of the history budget for the summary of old turns
+CONTEXT_HISTORY_MESSAGES = 20      # messages loaded when the prompt has to be rebuilt
+
+# ──────────────────────────────────────────────
+# 🌐 Headless server (python server.py)
+# ──────────────────────────────────────────────
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SERVER_MAX_CONCURRENCY = 4     # generations in flight to Ollama (match OLLAMA_NUM_PARALLEL)
+SERVER_MAX_QUEUE = 16          # turns allowed to wait for a slot; more get HTTP 503
+SERVER_QUEUE_TIMEOUT = 30.0    # seconds a turn may wait for a slot
+SERVER_SESSION_TTL = 3600.0    # idle sessions are dropped after this many seconds
+
+# ──────────────────────────────────────────────
+# ⌨️ Type-ahead warmup (model + prompt prefix warmed while the user types)
+# ──────────────────────────────────────────────
+WARMUP_ENABLED = True
+WARMUP_DEBOUNCE = 0.4         # seconds of no typing before warming
+WARMUP_MIN_INTERVAL = 30.0    # the same prefix is not re-sent within this many seconds
+
+# ──────────────────────────────────────────────
+# ⚡ Instant answers (dataset.csv + reply cache)
+# ──────────────────────────────────────────────
+FASTPATH_ENABLED = True
+RESPONSE_CACHE_SIZE = 256          # cached replies (LRU)
+RESPONSE_CACHE_TTL = 600.0         # seconds a cached reply stays valid
+
+# ──────────────────────────────────────────────
+# 💾 Conversation history (memory.db)
+# ──────────────────────────────────────────────
+DEFAULT_SESSION = "default"           # session used by the desktop window and CLI tools
+MEMORY_MAX_ROWS_PER_SESSION = 50000   # older rows are compacted away (None = unlimited)
+MEMORY_MAX_AGE_DAYS = 365             # rows older than this are compacted away (None = keep forever)
+
+# ──────────────────────────────────────────────
+# 🧩 Long-term (semantic) memory
+# ──────────────────────────────────────────────
+# Cost: a turn whose prompt is rebuilt from history embeds the user's message
+# (/api/embeddings) before generation starts, so time to first token includes
+# that round trip; if EMBED_MODEL is not resident Ollama loads it, possibly
+# evicting the chat model. The embedding is shared with indexing and cached,
+# and a query that takes longer than RECALL_QUERY_TIMEOUT skips recall.
+RECALL_ENABLED = True
+EMBED_MODEL = "nomic-embed-text"   # pulled with: ollama pull nomic-embed-text
+RECALL_TOP_K = 3                   # past messages added to the prompt
+RECALL_MIN_SCORE = 0.45            # cosine similarity cut-off
+RECALL_QUERY_TIMEOUT = 1.0         # seconds a turn waits for its query embedding
+RECALL_EMBED_CACHE = 256           # recent text -> vector entries kept in memory
+
+# ──────────────────────────────────────────────
+# ⏱ Per-turn latency tracing (summarize with: python tracing.py)
+# ──────────────────────────────────────────────
+TRACING_ENABLED = True
+TRACE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "traces.jsonl")
+
+# ──────────────────────────────────────────────
+# 🚀 Startup (report with: python tracing.py --kind startup)
+# ──────────────────────────────────────────────
+STARTUP_BUDGET_MS = 2500    # cold start to visible window; checked by: python main.py --startup-check
+
+# ──────────────────────────────────────────────
+# 🔊 Speech output
+# ──────────────────────────────────────────────
+COQUI_MODEL_NAME = "tts_models/en/ljspeech/vits"
+AUDIO_BACKEND = "auto"      # auto | sounddevice | simpleaudio | winsound | command
+PYTTSX3_RATE = 140          # words per minute of the fallback voice
+COQUI_WORKERS = 2           # synthesis processes (0 = synthesize in the GUI process)
+COQUI_MAX_SEGMENT_SECONDS = 30  # audio per sentence that fits a shared-memory slot
+TTS_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tts_cache")
+TTS_CACHE_MAX_MB = 200      # least recently spoken clips are deleted beyond this
+TTS_CACHE_HOT_ITEMS = 64    # clips also kept decoded in memory
+TTS_PREFILL = True          # synthesize canned replies and dataset answers while idle
+
+# ──────────────────────────────────────────────
+# 🎤 Speech input
+# ──────────────────────────────────────────────
+STT_BACKEND = "auto"        # auto | vosk | whisper | google | file
+STT_LANGUAGE = "en-US"
+VOSK_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "vosk")
+WHISPER_MODEL = "base"      # faster-whisper model size
+STT_TRANSCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "transcripts.txt")  # 'file' backend
+MIC_SAMPLE_RATE = 16000
+VAD_FRAME_MS = 30
+VAD_START_RATIO = 3.0       # speech = frame energy this many times above the noise floor
+VAD_MIN_ENERGY = 150        # never treat quieter frames as speech
+VAD_SILENCE_MS = 500        # silence that ends an utterance
+VAD_PREROLL_MS = 300        # audio kept from just before speech started
+LISTEN_TIMEOUT = 6          # seconds to wait for speech to start
+PHRASE_TIME_LIMIT = 12      # longest utterance (s)
 
 # ──────────────────────────────────────────────
 # 🧠 System Prompt — Personality Definition
@@ -0,0 +1,196 @@
+import csv
+import difflib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from config import FASTPATH_ENABLED, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, DEFAULT_SESSION
+
+DATASET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dataset.csv")
+
+_PUNCT_RE = re.compile(r"[^\w\s\u0900-\u097F]+")
+_REPEAT_RE = re.compile(r"(.)\1{2,}")
+_SPACE_RE = re.compile(r"\s+")
+
+# Words that make a prompt's answer depend on the conversation so far
+# ("why?", "explain that", "and then?") or on what the user told Vi
+# ("what is my name"). Such prompts are never answered from the cache.
+CONTEXT_WORDS = frozenset("""
+    why explain explained elaborate more again continue then also else next previous last
+    it its this that these those he him his she her they them their
+    i me my mine myself we us our
+""".split())
+MIN_CACHE_WORDS = 3  # shorter prompts ("and?", "ok so") are follow-ups too
+
+
+def normalize(text):
+    """'Hellooo Vi!!  ' -> 'hello vi' (case, punctuation, emoji, stretched letters, spaces)."""
+    text = _PUNCT_RE.sub(" ", (text or "").lower())
+    text = _REPEAT_RE.sub(r"\1", text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def _token_close(a, b):
+    # Short words must match exactly ("how" vs "who"); longer ones may have a typo
+    return len(a) >= 5 and a[0] == b[0] and difflib.SequenceMatcher(None, a, b).ratio() >= 0.85
+
+
+class DatasetIndex:
+    """Canned question -> (answer, emotion) rows from dataset.csv, keyed by normalized text."""
+
+    def __init__(self, path=DATASET_PATH):
+        self.path = path
+        self.answers = {}
+        self.by_length = {}   # token count -> [token tuple]
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                with open(self.path, newline="", encoding="utf-8") as f:
+                    for row in csv.DictReader(f):
+                        key = normalize(row.get("question"))
+                        answer = (row.get("answer") or "").strip()
+                        if not key or not answer:
+                            continue
+                        self.answers[key] = (answer, (row.get("emotion") or "neutral").strip() or "neutral")
+                        tokens = tuple(key.split())
+                        self.by_length.setdefault(len(tokens), []).append(tokens)
+            except OSError as e:
+                print(f"[FastPath Error] {e}")
+            self._loaded = True
+
+    def lookup(self, text):
+        """Exact match on normalized text, else a same-length match with one small typo."""
+        self.load()
+        key = normalize(text)
+        if not key:
+            return None
+        hit = self.answers.get(key)
+        if hit is not None:
+            return hit
+        tokens = key.split()
+        for candidate in self.by_length.get(len(tokens), ()):
+            fuzzy = 0
+            for a, b in zip(tokens, candidate):
+                if a == b:
+                    continue
+                fuzzy += 1
+                if fuzzy > 1 or not _token_close(a, b):
+                    break
+            else:
+                return self.answers[" ".join(candidate)]
+        return None
+
+
+class ResponseCache:
+    """Thread-safe LRU of generated replies with a per-entry TTL, keyed by (session, prompt)."""
+
+    def __init__(self, max_size=256, ttl=600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self, session=None):
+        """Drop every entry, or only those of one session."""
+        with self._lock:
+            if session is None:
+                self._data.clear()
+            else:
+                for key in [k for k in self._data if k[0] == session]:
+                    del self._data[key]
+
+    def __len__(self):
+        return len(self._data)
+
+
+DATASET = DatasetIndex()
+CACHE = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+STATS = {"dataset_hits": 0, "cache_hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name):
+    with _stats_lock:
+        STATS[name] += 1
+
+
+def cache_key(user_input, session=DEFAULT_SESSION):
+    """(session, normalized prompt), or None when the reply depends on context and must not be reused."""
+    key = normalize(user_input)
+    words = key.split()
+    if len(words) < MIN_CACHE_WORDS or CONTEXT_WORDS.intersection(words):
+        return None
+    return session, key
+
+
+def lookup(user_input, session=DEFAULT_SESSION):
+    """
+    Instant answer for a turn, or None if the model has to run.
+    Returns (text, emotion, source) where source is 'dataset' or 'cache';
+    emotion is None for cached replies. Dataset answers are shared, cached
+    replies only come back in the session they were generated for.
+    """
+    if not FASTPATH_ENABLED:
+        return None
+    hit = DATASET.lookup(user_input)
+    if hit is not None:
+        _count("dataset_hits")
+        return hit[0], hit[1], "dataset"
+    key = cache_key(user_input, session)
+    cached = CACHE.get(key) if key is not None else None
+    if cached is not None:
+        _count("cache_hits")
+        return cached, None, "cache"
+    _count("misses")
+    return None
+
+
+def remember(user_input, reply, session=DEFAULT_SESSION):
+    """Cache a finished model reply for this prompt in this session (context-dependent prompts are skipped)."""
+    key = cache_key(user_input, session)
+    if FASTPATH_ENABLED and key is not None and (reply or "").strip():
+        CACHE.put(key, reply)
+
+
+def forget(session=None):
+    """Drop cached replies of a cleared session (None: all); registered with memory.on_clear."""
+    CACHE.clear(session)
+
+
+def stats():
+    """Hit/miss counters plus the share of turns that skipped the model."""
+    with _stats_lock:
+        out = dict(STATS)
+    total = out["dataset_hits"] + out["cache_hits"] + out["misses"]
+    out["total"] = total
+    out["hit_rate"] = (total - out["misses"]) / total if total else 0.0
+    out["cache_size"] = len(CACHE)
+    return out
@@ -0,0 +1,655 @@
+"""
+The desktop app: Qt window, workers and the WebChannel bridge to ui/.
+Started by main.py, which stays import-free so Coqui's spawned worker
+processes (they re-run it as __mp_main__) do not load Qt, brain or memory.
+"""
+import sys
+import os
+import signal
+import json
+import struct
+import time
+
+from tracing import Trace
+from config import CONTEXT_HISTORY_MESSAGES, STARTUP_BUDGET_MS, TTS_PREFILL, COQUI_WORKERS, RECALL_ENABLED
+
+# Cold-start timeline: import time per module, window shown, first paint, model ready.
+# Heavy dependencies (Coqui/PyTorch, pyttsx3, speech_recognition, NumPy) are not imported
+# here; they load on first use or in PrewarmWorker after the window is up.
+# t0 is main.STARTED, taken first thing in main.py, so everything after interpreter init counts
+STARTUP = Trace("startup", t0=getattr(sys.modules.get("__main__"), "STARTED", None))
+
+with STARTUP.span("import.qt"):
+    from PyQt6.QtWidgets import (
+        QApplication, QWidget, QLabel,
+        QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QScrollArea, QFrame, QStackedLayout
+    )
+    from PyQt6.QtGui import QPixmap, QFont, QMovie, QPalette, QBrush, QGuiApplication
+    from PyQt6.QtCore import Qt, QThread, pyqtSignal, QTimer, QSize, QUrl, QObject, pyqtSlot
+    from PyQt6.QtWebEngineWidgets import QWebEngineView
+    from PyQt6.QtWebChannel import QWebChannel
+
+with STARTUP.span("import.brain"):
+    from brain import (get_response, stream_response, parse_response, prewarm_model, plan_turn, CancelToken,
+                       reset_context, warm_prefix, WARMER, get_semantic, CANNED_REPLIES)
+    from fastpath import DATASET
+with STARTUP.span("import.memory"):
+    from memory import init_db, save_message, get_recent_history, close as close_memory
+with STARTUP.span("import.voice"):
+    from voice import VOICE, NoSpeech
+with STARTUP.span("import.speech"):
+    from speech import (SentenceSplitter, SpeechPipeline, COQUI, COQUI_POOL, PYTTSX3, coqui_available, get_player,
+                        Audio, Future)
+    from tts_cache import TTS_CACHE
+
+# Coqui model itself is loaded in the background at startup (see AIAssistant._prewarm)
+COQUI_AVAILABLE = coqui_available()
+# Worker processes keep PyTorch off the GUI interpreter; COQUI_WORKERS = 0 synthesizes in-process
+COQUI_ENGINE = COQUI_POOL if COQUI_WORKERS > 0 else COQUI
+COQUI_VOICE = f"coqui:{COQUI.model_name}"  # TTS cache key; Coqui has no speaking-rate setting
+COQUI_RATE = 1.0
+
+# Ensure asset paths work regardless of working directory
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RENDER_INTERVAL_MS = 16  # streamed text reaches the page at most once per frame (~60 fps)
+ASSETS_DIR = os.path.join(BASE_DIR, "assets")
+ASSET_EXTENSIONS = (".gif", ".png", ".jpg", ".jpeg", ".webp")
+
+
+# ──────────────────────────────────────────────
+# 🖼 Character assets
+# ──────────────────────────────────────────────
+def _image_size(path):
+    """(width, height) from a GIF/PNG header; (None, None) for other formats."""
+    with open(path, "rb") as f:
+        head = f.read(24)
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return struct.unpack("<HH", head[6:10])
+    if head[:8] == b"\x89PNG\r\n\x1a\n":
+        return struct.unpack(">II", head[16:24])
+    return None, None
+
+
+def build_asset_manifest(assets_dir=ASSETS_DIR):
+    """{folder: [{src, bytes, width, height}]} for every image under assets/, with page-relative src."""
+    manifest = {}
+    if not os.path.isdir(assets_dir):
+        return manifest
+    for folder in sorted(os.listdir(assets_dir)):
+        folder_path = os.path.join(assets_dir, folder)
+        if not os.path.isdir(folder_path):
+            continue
+        items = []
+        for name in sorted(os.listdir(folder_path)):
+            if not name.lower().endswith(ASSET_EXTENSIONS):
+                continue
+            path = os.path.join(folder_path, name)
+            try:
+                width, height = _image_size(path)
+                size = os.path.getsize(path)
+            except (OSError, struct.error):
+                continue
+            items.append({"src": f"../assets/{folder}/{name}", "bytes": size, "width": width, "height": height})
+        if items:
+            manifest[folder] = items
+    return manifest
+
+
+# ──────────────────────────────────────────────
+# 🧵 Background Worker for LLM calls
+# ──────────────────────────────────────────────
+class ResponseWorker(QThread):
+    """Runs Gemini API call in background thread so GUI stays responsive."""
+    # Every signal carries the turn id so the window can drop updates from preempted turns
+    finished = pyqtSignal(int, str, str, str)
+    progress = pyqtSignal(int, str)  # new text only (delta), not the whole buffer
+    sentence = pyqtSignal(int, str)
+
+    def __init__(self, user_input, history, trace=None, turn_id=0):
+        super().__init__()
+        self.user_input = user_input
+        self.history = history
+        self.trace = trace
+        self.turn_id = turn_id
+        self.plan = None
+        self.cancel_token = CancelToken()
+
+    def cancel(self):
+        """Preempt this turn: stop reading and close the HTTP stream to Ollama."""
+        self.requestInterruption()
+        self.cancel_token.cancel()
+
+    def run(self):
+        try:
+            # Keyword analysis, options, model and system prompt: once per turn
+            with self.trace.span("plan"):
+                self.plan = plan_turn(self.user_input)
+            self.trace.set(emotion=self.plan.visual_emotion)
+            buffer = ""
+            splitter = SentenceSplitter()
+            for chunk in stream_response(self.user_input, self.history, self.plan, self.trace, self.cancel_token):
+                if self.isInterruptionRequested():
+                    break
+                buffer += chunk
+                self.progress.emit(self.turn_id, chunk)
+                # Hand finished sentences to TTS while the model keeps streaming
+                for s in splitter.feed(chunk):
+                    self.sentence.emit(self.turn_id, s)
+            if self.isInterruptionRequested():
+                self.trace.set(cancelled=True)
+                self.trace.finish()
+                return
+            rest = splitter.flush()
+            if rest:
+                self.sentence.emit(self.turn_id, rest)
+            if buffer:
+                response, _ = parse_response(buffer)
+                self.trace.set(reply_chars=len(response))
+                self.finished.emit(self.turn_id, self.user_input, response, self.plan.visual_emotion)
+            else:
+                # Nothing to speak, so no SpeakWorker will close this trace
+                self.trace.finish()
+        except KeyboardInterrupt:
+            pass
+
+
+class PrewarmWorker(QThread):
+    """Initializes LLM model on startup to reduce first-response delay."""
+    ready = pyqtSignal(bool)  # True when the model answered
+
+    def run(self):
+        ok = False
+        try:
+            # Semantic index (and NumPy) loads here, after the window is shown
+            if RECALL_ENABLED:
+                get_semantic()
+            ok = prewarm_model()
+            if not COQUI_AVAILABLE:
+                PYTTSX3.wait(timeout=10)  # voice resolved before idle prefill starts
+        except Exception:
+            pass
+        self.ready.emit(ok)
+
+
+class VoiceWorker(QThread):
+    """Listens for one utterance on the shared voice service (mic stays open between turns)."""
+    text_received = pyqtSignal(str)
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, service):
+        super().__init__()
+        self.service = service
+        self.timings = []
+
+    def run(self):
+        try:
+            text, self.timings = self.service.listen()
+            self.text_received.emit(text)
+        except NoSpeech:
+            self.text_received.emit("")
+        except Exception as e:
+            print(f"[Voice Error] {e}")
+            self.error_occurred.emit(str(e))
+
+
+class SpeakWorker(QThread):
+    """
+    Runs TTS in background thread so GUI doesn't freeze while speaking.
+    Sentences can be queued with put() while the reply is still streaming;
+    close() marks the end of the turn.
+    """
+    speaking_started = pyqtSignal()
+    speaking_finished = pyqtSignal()
+
+    def __init__(self, trace=None, turn_id=0):
+        super().__init__()
+        # With the process pool, up to one sentence per worker synthesizes ahead of playback
+        self.pipeline = SpeechPipeline(self._synthesize_traced, self._play_traced, prefetch=max(2, COQUI_WORKERS + 1))
+        self.trace = trace
+        self.turn_id = turn_id
+        self._first_audio = True
+
+    def put(self, text):
+        self.pipeline.put(text)
+
+    def close(self):
+        self.pipeline.close()
+
+    def stop(self):
+        """Drop queued sentences and cut the clip that is playing."""
+        self.pipeline.stop()
+        try:
+            get_player().stop()
+        except Exception:
+            pass
+        if not COQUI_AVAILABLE:
+            PYTTSX3.interrupt()
+
+    def _synthesize_traced(self, text):
+        if self.trace is None:
+            return self._synthesize(text)
+        start = time.perf_counter()
+        audio = self._synthesize(text)
+        if isinstance(audio, Future):
+            # Span ends when the worker process delivered the audio
+            audio.add_done_callback(lambda _: self.trace.add_span("tts.synthesize", start, chars=len(text), pool=True))
+        else:
+            self.trace.add_span("tts.synthesize", start, chars=len(text))
+        return audio
+
+    def _play_traced(self, audio):
+        if self.trace is None:
+            return self._play(audio)
+        if self._first_audio:
+            # Turn start (user pressed Enter / stopped speaking) until Vi starts talking
+            self._first_audio = False
+            self.trace.add_span("tts.first_audio", self.trace.t0)
+        with self.trace.span("playback"):
+            return self._play(audio)
+
+    def _synthesize(self, text):
+        if not COQUI_AVAILABLE:
+            return text  # pyttsx3 renders (and caches) on the engine thread, see _play
+        # In-memory samples; phrases spoken before come straight from the TTS cache
+        if COQUI_WORKERS <= 0:
+            return TTS_CACHE.cached(text, COQUI_VOICE, COQUI_RATE, COQUI.synthesize)
+        audio = TTS_CACHE.get(text, COQUI_VOICE, COQUI_RATE)
+        if audio is not None:
+            return audio
+        future = COQUI_POOL.submit(text)
+        future.add_done_callback(
+            lambda f: TTS_CACHE.put(text, COQUI_VOICE, COQUI_RATE, f.result())
+            if not f.cancelled() and f.exception() is None else None
+        )
+        return future
+
+    def _play(self, audio):
+        if isinstance(audio, Audio):
+            get_player().play(audio)
+            return
+        clip = self._pyttsx3_clip(audio)
+        if clip is not None:
+            get_player().play(clip)
+            return
+        # Shared engine thread: no pyttsx3.init() or voice lookup per reply
+        PYTTSX3.say(audio)
+
+    @staticmethod
+    def _pyttsx3_clip(text):
+        """Cached or freshly rendered pyttsx3 audio; None when the text has to be spoken directly."""
+        try:
+            get_player()
+        except Exception:
+            return None
+        if not PYTTSX3.wait():
+            return None
+        voice = f"pyttsx3:{PYTTSX3.voice_id}"
+        return TTS_CACHE.cached(text, voice, PYTTSX3.rate, PYTTSX3.render)
+
+    def run(self):
+        try:
+            self.pipeline.run(on_start=self.speaking_started.emit)
+        except Exception as e:
+            print(f"[Speech Error] {e}")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if self.trace is not None:
+                self.trace.finish()
+            try:
+                self.speaking_finished.emit()
+            except Exception:
+                pass
+
+
+# ──────────────────────────────────────────────
+# 🖥 Main Application Window
+# ──────────────────────────────────────────────
+# ──────────────────────────────────────────────
+# 🔗 Python-JS Bridge
+# ──────────────────────────────────────────────
+class Backend(QObject):
+    def __init__(self, main_window):
+        super().__init__()
+        self.main_window = main_window
+
+    @pyqtSlot(str)
+    def process_text(self, text):
+        self.main_window.process_text_from_web(text)
+
+    @pyqtSlot()
+    def start_voice_input(self):
+        self.main_window.voice_input()
+
+    @pyqtSlot(str)
+    def typing(self, text):
+        self.main_window.on_typing(text)
+
+class AIAssistant(QWidget):
+    def __init__(self, startup_check=False):
+        super().__init__()
+        self.startup_check = startup_check  # exit at first paint, non-zero when over STARTUP_BUDGET_MS
+        self._startup_marks = set()
+
+        # Initialize memory database
+        init_db()
+
+        self.setWindowTitle("Vi — Your AI Companion 💙")
+        self.setGeometry(100, 100, 450, 700)
+        self.setMinimumSize(400, 600)
+        self.setStyleSheet("""
+            QWidget {
+                background-color: #0d1117;
+                color: #e6edf3;
+                font-family: 'Segoe UI', Arial, sans-serif;
+            }
+        """)
+
+        # Track worker threads
+        self.worker = None
+        self._turn_id = 0
+        self._response_workers = set()  # preempted turns still winding down
+        self.speak_worker = None
+        self._speak_workers = set()  # keep running QThreads referenced until done
+        self._voice_timings = []     # STT spans waiting for the next turn's trace
+
+        # Streamed text is coalesced and pushed to the page at most once per frame
+        self._pending_text = []
+        self._render_timer = QTimer(self)
+        self._render_timer.setSingleShot(True)
+        self._render_timer.setInterval(RENDER_INTERVAL_MS)
+        self._render_timer.timeout.connect(self._flush_text)
+        self.prewarm_worker = None
+        self.voice_worker = None
+        # Scanned once; the page picks GIFs from it instead of probing guessed file names
+        self.asset_manifest = build_asset_manifest()
+
+        self._build_ui()
+
+    def _build_ui(self):
+        self.setWindowTitle("Vi Companion")
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        # 🌐 Web View
+        self.web_view = QWebEngineView()
+        self.web_view.setContextMenuPolicy(Qt.ContextMenuPolicy.NoContextMenu)
+        
+        # Setup Bridge
+        self.channel = QWebChannel()
+        self.backend = Backend(self)
+        self.channel.registerObject("backend", self.backend)
+        self.web_view.page().setWebChannel(self.channel)
+
+        # Load HTML
+        ui_file = os.path.join(BASE_DIR, "ui", "index.html")
+        self.web_view.setUrl(QUrl.fromLocalFile(ui_file))
+        
+        layout.addWidget(self.web_view)
+
+        self._prewarm()
+        self._center_and_resize()
+        try:
+            self.web_view.loadFinished.connect(lambda _: self._push_asset_manifest())
+            # The page is the whole UI: once it has loaded, the first frame with content is painted
+            self.web_view.loadFinished.connect(lambda ok: self.mark_startup("first_paint", ok=ok))
+        except Exception:
+            pass
+
+    def _center_and_resize(self):
+        screen = QGuiApplication.primaryScreen()
+        if screen is not None:
+            geo = screen.availableGeometry()
+            w = min(450, int(geo.width() * 0.45))
+            h = min(900, int(geo.height() * 0.78))
+            self.resize(w, h)
+            fg = self.frameGeometry()
+            fg.moveCenter(geo.center())
+            self.move(fg.topLeft())
+
+    def _prewarm(self):
+        """Warm up the LLM and load the Coqui voice in background threads."""
+        self.prewarm_worker = PrewarmWorker()
+        self.prewarm_worker.ready.connect(lambda ok: self.mark_startup("model_ready", ok=ok))
+        self.prewarm_worker.ready.connect(lambda _: self._prefill_speech())
+        self.prewarm_worker.start()
+        if COQUI_AVAILABLE:
+            COQUI_ENGINE.load_async()
+        else:
+            PYTTSX3.start()  # engine init and voice lookup happen once, off the GUI thread
+
+    def _prefill_speech(self):
+        """Synthesize canned replies and dataset answers into the TTS cache while Vi is idle."""
+        if not TTS_PREFILL:
+            return
+        DATASET.load()
+        phrases = list(CANNED_REPLIES) + [answer for answer, _ in DATASET.answers.values()]
+        if COQUI_AVAILABLE:
+            TTS_CACHE.prefill_async(phrases, COQUI_ENGINE.synthesize, COQUI_VOICE, COQUI_RATE, is_busy=self._speech_busy)
+        elif PYTTSX3.wait(timeout=0):
+            TTS_CACHE.prefill_async(phrases, PYTTSX3.render, f"pyttsx3:{PYTTSX3.voice_id}", PYTTSX3.rate,
+                                    is_busy=self._speech_busy)
+
+    def _speech_busy(self):
+        return bool(self._speak_workers) or (self.worker is not None and self.worker.isRunning())
+
+    def mark_startup(self, name, **attrs):
+        """Record a cold-start milestone (ms since main.py started); report once all are in."""
+        if STARTUP.finished or name in self._startup_marks:
+            return
+        self._startup_marks.add(name)
+        STARTUP.add_span(name, STARTUP.t0, **attrs)
+        if self.startup_check and name == "first_paint":
+            elapsed_ms = (time.perf_counter() - STARTUP.t0) * 1000.0
+            self._finish_startup()
+            if elapsed_ms > STARTUP_BUDGET_MS:
+                print(f"[Startup Error] first paint after {elapsed_ms:.0f} ms, budget {STARTUP_BUDGET_MS} ms")
+                QApplication.instance().exit(1)
+            else:
+                QApplication.instance().exit(0)
+        elif {"first_paint", "model_ready"} <= self._startup_marks:
+            self._finish_startup()
+
+    def _finish_startup(self):
+        STARTUP.set(budget_ms=STARTUP_BUDGET_MS)
+        spans = STARTUP.to_dict()["spans"]
+        print("[Startup] " + ", ".join(f"{s['name']} {s['duration_ms']:.0f} ms" for s in spans))
+        STARTUP.finish()
+
+    def _push_asset_manifest(self):
+        try:
+            js = f"setAssetManifest({json.dumps(self.asset_manifest)});"
+            self.web_view.page().runJavaScript(js)
+        except Exception:
+            pass
+
+    def _preempt(self):
+        """
+        Abort the turn in flight: close its HTTP stream (Ollama stops
+        generating), silence and flush its speech, drop queued UI text.
+        Bumping the turn id makes late signals from old workers no-ops.
+        """
+        self._turn_id += 1
+        if self.worker is not None and self.worker.isRunning():
+            self.worker.cancel()
+            self._response_workers.add(self.worker)
+        self._response_workers = {w for w in self._response_workers if w.isRunning()}
+        for worker in list(self._speak_workers):
+            worker.stop()
+        self.speak_worker = None
+        self._render_timer.stop()
+        self._pending_text = []
+        self.web_view.page().runJavaScript("endResponse()")
+
+    def on_typing(self, text):
+        # Warm the model while the user types, but never compete with a reply being generated
+        if self.worker is not None and self.worker.isRunning():
+            return
+        warm_prefix(text)
+
+    def process_text_from_web(self, text):
+        WARMER.cancel()
+        self._preempt()
+        turn_id = self._turn_id
+        self._last_user = text
+        trace = Trace("turn", input_chars=len(text), input="voice" if self._voice_timings else "text")
+        for name, start, end in self._voice_timings:
+            trace.add_span(name, start, end)
+        self._voice_timings = []
+        save_message("user", text)
+        with trace.span("history"):
+            history = get_recent_history(CONTEXT_HISTORY_MESSAGES)
+        
+        self.worker = ResponseWorker(text, history, trace, turn_id)
+        self.worker.finished.connect(self.on_response)
+        self.worker.progress.connect(self.on_progress)
+        self.worker.sentence.connect(self.on_sentence)
+        self.worker.start()
+
+    def on_progress(self, turn_id, delta):
+        if turn_id != self._turn_id:
+            return
+        # Queue the delta; the render timer sends everything queued in one call per frame
+        self._pending_text.append(delta)
+        if not self._render_timer.isActive():
+            self._render_timer.start()
+
+    def _flush_text(self):
+        if not self._pending_text:
+            return
+        delta = "".join(self._pending_text)
+        self._pending_text = []
+        self.web_view.page().runJavaScript(f"appendResponse({json.dumps(delta)})")
+
+    def on_sentence(self, turn_id, sentence):
+        if turn_id != self._turn_id:
+            return
+        # First sentence of the turn starts the speech pipeline; later ones are queued
+        if self.speak_worker is None:
+            self.speak_worker = self._start_speech(self.worker.plan.visual_emotion, trace=self.worker.trace)
+        self.speak_worker.put(sentence)
+
+    def on_response(self, turn_id, user_input, response, emotion):
+        if turn_id != self._turn_id:
+            return
+        save_message("assistant", response)
+        
+        # `emotion` is the turn plan's visual emotion (smile for study, talk for neutral)
+        final_emotion = emotion
+        
+        # Update Web UI: the text is already on screen, just push what is still queued
+        self._render_timer.stop()
+        self._flush_text()
+        self.web_view.page().runJavaScript("endResponse()")
+        # Emotion during speaking is handled by SpeakWorker signals
+        self.web_view.page().runJavaScript("stopListening()")
+        
+        if self.speak_worker is not None:
+            # Sentences were already streamed into the speech pipeline
+            self.speak_worker.close()
+        else:
+            self.speak_worker = self._start_speech(final_emotion, response, trace=self.worker.trace)
+            self.speak_worker.close()
+
+    def voice_input(self):
+        # A new (spoken) turn starts: stop the current answer so the mic does not hear Vi
+        self._preempt()
+        # Notify web UI that we are listening
+        self.web_view.page().runJavaScript("document.body.classList.add('listening')")
+        
+        if self.voice_worker is not None and self.voice_worker.isRunning():
+            return  # already listening
+        self.voice_worker = VoiceWorker(VOICE)
+        self.voice_worker.text_received.connect(self._on_voice_timings)
+        self.voice_worker.text_received.connect(
+            lambda t: (
+                self.web_view.page().runJavaScript("stopListening()"),
+                self.web_view.page().runJavaScript(f"setInputAndSend({json.dumps(t)})")
+            ) if t.strip() else self.web_view.page().runJavaScript("updateResponse(\"Voice input ऐकू आलं नाही. पुन्हा try करा.\")")
+        )
+        self.voice_worker.error_occurred.connect(
+            lambda e: (
+                self.web_view.page().runJavaScript("stopListening()"),
+                self.web_view.page().runJavaScript("updateResponse(\"Mic error आला. कृपया microphone access तपासा.\")"),
+            )
+        )
+        self.voice_worker.start()
+
+    def _on_voice_timings(self, _text):
+        # Picked up by process_text_from_web for the turn's trace
+        self._voice_timings = self.voice_worker.timings
+
+    # 🗑 Clear Conversation Memory
+    def clear_memory(self):
+        from memory import clear_memory
+        clear_memory()
+        reset_context()
+        self.chat_area.setText("🧹 Memory clear zali! Fresh start! Bola kaay chaallay?")
+        self.set_expression("neutral")
+
+    # 🔊 Text-to-Speech (runs in background thread)
+    def speak(self, text, emotion="talk"):
+        self.speak_worker = self._start_speech(emotion, text)
+        self.speak_worker.close()
+
+    def _start_speech(self, emotion="talk", text=None, trace=None):
+        worker = SpeakWorker(trace, self._turn_id)
+        worker.put(text)
+        worker.speaking_started.connect(
+            lambda: (
+                self.web_view.page().runJavaScript(f"updateEmotion('{emotion}')"),
+                self.web_view.page().runJavaScript("startSpeaking()"),
+            ) if worker.turn_id == self._turn_id else None
+        )
+        worker.speaking_finished.connect(
+            lambda: (
+                self.web_view.page().runJavaScript("stopSpeaking()"),
+                self.web_view.page().runJavaScript("updateEmotion('idle')"),
+            ) if worker.turn_id == self._turn_id or self.speak_worker is None else None
+        )
+        # Do not force 'idle' after speaking; keep last emotion's GIF visible
+        self._speak_workers.add(worker)
+        worker.finished.connect(lambda: self._speak_workers.discard(worker))
+        worker.start()
+        return worker
+
+
+# 🚀 Run Application (main.py is the entry point)
+def main():
+    # --startup-check: open the window, exit 1 if the first paint misses STARTUP_BUDGET_MS
+    startup_check = "--startup-check" in sys.argv
+    app = QApplication([a for a in sys.argv if a != "--startup-check"])
+    # Flush queued history writes before the process exits
+    app.aboutToQuit.connect(close_memory)
+    app.aboutToQuit.connect(VOICE.close)
+    app.aboutToQuit.connect(PYTTSX3.close)
+    app.aboutToQuit.connect(COQUI_POOL.close)
+
+    # Set global font
+    font = QFont("Segoe UI", 11)
+    app.setFont(font)
+
+    def _sigint_handler(sig, frame):
+        try:
+            QApplication.instance().quit()
+        except Exception:
+            pass
+    try:
+        signal.signal(signal.SIGINT, _sigint_handler)
+    except Exception:
+        pass
+    t = QTimer()
+    t.start(250)
+    t.timeout.connect(lambda: None)
+
+    window = AIAssistant(startup_check=startup_check)
+    window.show()
+    window.mark_startup("window_shown")
+    try:
+        sys.exit(app.exec())
+    except KeyboardInterrupt:
+        try:
+            QApplication.instance().quit()
+        except Exception:
+            pass
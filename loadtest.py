@@ -0,0 +1,237 @@
+"""
+Load test: several simulated users talking to one Ollama box at once.
+
+    python loadtest.py --users 8 --arrival-rate 2 --think-time 1 --parallel 2
+    python loadtest.py --url http://gpu-box:11434 --users 4 --script history.jsonl
+
+Each user replays a scripted conversation through memory.save_message ->
+memory.get_recent_history -> brain.stream_response -> memory.save_message,
+exactly like a turn in gui.py, in its own session. Users arrive as a
+Poisson process (--arrival-rate users/s, 0 = all at once) and pause an
+exponentially distributed think time between turns. Without --url a local
+mock Ollama is started; --parallel then emulates OLLAMA_NUM_PARALLEL and
+the mock's slot waits are reported as queueing delay.
+
+Reports throughput, queueing delay, TTFT and end-to-end percentiles, turns
+that ended in a fallback reply, and SQLite errors (failed turns plus the
+background writer's counters).
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from bench import summarize
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_scripts(path=None):
+    """
+    Conversations to replay, as lists of user messages.
+    - None / .csv: one conversation made of dataset.csv's questions
+    - .jsonl: memory.py exports or transcripts; user rows grouped by session_id
+    """
+    path = path or os.path.join(BASE_DIR, "dataset.csv")
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            questions = [row["question"].strip() for row in csv.DictReader(f) if (row.get("question") or "").strip()]
+        return [questions]
+    sessions = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if item.get("role", "user") == "user" and item.get("message"):
+                sessions.setdefault(item.get("session_id") or "default", []).append(item["message"])
+    return [turns for turns in sessions.values() if turns]
+
+
+class Recorder:
+    """Per-turn measurements from every user thread."""
+
+    def __init__(self):
+        self.ttft = []
+        self.e2e = []
+        self.chunks = 0
+        self.turns = 0
+        self.fallbacks = 0
+        self.sqlite_errors = 0
+        self.other_errors = 0
+        self._lock = threading.Lock()
+
+    def turn(self, ttft, e2e, chunks, fallback):
+        with self._lock:
+            self.turns += 1
+            self.chunks += chunks
+            if ttft is not None:
+                self.ttft.append(ttft)
+            self.e2e.append(e2e)
+            self.fallbacks += int(fallback)
+
+    def error(self, exc):
+        with self._lock:
+            if isinstance(exc, sqlite3.Error):
+                self.sqlite_errors += 1
+            else:
+                self.other_errors += 1
+
+
+def run_user(brain, memory, session, turns, think_time, rng, rec):
+    history_size = brain.CONTEXT_HISTORY_MESSAGES
+    for i, text in enumerate(turns):
+        if i and think_time > 0:
+            time.sleep(rng.expovariate(1.0 / think_time))
+        try:
+            start = time.perf_counter()
+            memory.save_message("user", text, session=session)
+            history = memory.get_recent_history(history_size, session)
+            plan = brain.plan_turn(text)
+            first = None
+            parts = []
+            for chunk in brain.stream_response(text, history, plan, session=session):
+                if first is None:
+                    first = time.perf_counter()
+                parts.append(chunk)
+            reply = "".join(parts)
+            memory.save_message("assistant", reply, plan.visual_emotion, session=session)
+            end = time.perf_counter()
+            rec.turn(first - start if first is not None else None, end - start, len(parts),
+                     reply.strip() in brain.CANNED_REPLIES)
+        except Exception as e:
+            print(f"[LoadTest Error] {session}: {e!r}")
+            rec.error(e)
+
+
+def run(args):
+    sys.path.insert(0, BASE_DIR)
+    import memory
+
+    tmp = tempfile.mkdtemp(prefix="vi-load-")
+    memory.DB_PATH = os.path.abspath(args.db) if args.db else os.path.join(tmp, "load.db")
+    memory.init_db()
+
+    import brain
+    import fastpath
+
+    mock = None
+    if args.url:
+        brain.use_server(args.url)
+    else:
+        from mock_ollama import MockOllama
+        mock = MockOllama(token_rate=args.token_rate, first_token_delay=args.first_token_delay,
+                          tokens=args.tokens, error_rate=args.error_rate, parallel=args.parallel,
+                          seed=args.seed).start()
+        brain.use_server(mock.url)
+    if not args.fastpath:
+        # Dataset answers and cached replies would skip the model entirely
+        fastpath.FASTPATH_ENABLED = False
+        fastpath.CACHE.max_size = 0
+
+    scripts = load_scripts(args.script)
+    if not scripts:
+        raise SystemExit(f"No conversations in {args.script}")
+    rng = random.Random(args.seed)
+    rec = Recorder()
+    threads = []
+    errors_before = dict(memory.STATS)
+    started = time.perf_counter()
+    try:
+        for u in range(args.users):
+            if u and args.arrival_rate > 0:
+                time.sleep(rng.expovariate(args.arrival_rate))
+            script = scripts[u % len(scripts)]
+            turns = [script[i % len(script)] for i in range(args.turns or len(script))]
+            t = threading.Thread(
+                target=run_user,
+                args=(brain, memory, f"load-{u}", turns, args.think_time, random.Random(rng.random()), rec),
+                name=f"load-user-{u}",
+                daemon=True,
+            )
+            t.start()
+            threads.append(t)
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+        memory.flush()
+    finally:
+        if mock is not None:
+            mock.stop()
+        memory.close()
+
+    results = {
+        "wall_s": elapsed,
+        "turns": rec.turns,
+        "turns_per_sec": rec.turns / elapsed if elapsed else 0.0,
+        "chunks_per_sec": rec.chunks / elapsed if elapsed else 0.0,
+        "ttft_ms": summarize(rec.ttft),
+        "e2e_ms": summarize(rec.e2e),
+        "fallback_replies": rec.fallbacks,
+        "errors": {
+            "sqlite": rec.sqlite_errors,
+            "other": rec.other_errors,
+            **{k: memory.STATS[k] - errors_before.get(k, 0) for k in memory.STATS},
+        },
+    }
+    if mock is not None:
+        results["queue_wait_ms"] = summarize(mock.stats["queue_wait"])
+        results["mock"] = {k: v for k, v in mock.stats.items() if k != "queue_wait"}
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "config": {k: v for k, v in vars(args).items() if k != "json"},
+        },
+        "results": results,
+    }
+
+
+def print_report(report):
+    r = report["results"]
+    print(f"{r['turns']} turns in {r['wall_s']:.1f}s: {r['turns_per_sec']:.2f} turns/s, "
+          f"{r['chunks_per_sec']:.1f} chunks/s")
+    print(f"{'':<14} {'n':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    for name in ("queue_wait_ms", "ttft_ms", "e2e_ms"):
+        s = r.get(name)
+        if not s or not s.get("n"):
+            continue
+        print(f"{name:<14} {s['n']:>6} {s['p50']:>10.1f} {s['p95']:>10.1f} {s['p99']:>10.1f} {s['max']:>10.1f}")
+    print(f"fallback replies: {r['fallback_replies']}  errors: "
+          + ", ".join(f"{k}={v}" for k, v in r["errors"].items()))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Concurrent-user load test of brain.py + memory.py")
+    ap.add_argument("--users", type=int, default=4, help="simulated users (one session each)")
+    ap.add_argument("--arrival-rate", type=float, default=1.0, help="new users per second (0 = all at once)")
+    ap.add_argument("--think-time", type=float, default=1.0, help="mean pause between a user's turns (s)")
+    ap.add_argument("--turns", type=int, default=0, help="turns per user (default: the whole script)")
+    ap.add_argument("--script", help="dataset-style .csv or JSONL transcript (default: dataset.csv)")
+    ap.add_argument("--fastpath", action="store_true", help="let dataset/cached answers skip the model")
+    ap.add_argument("--url", help="real Ollama server; without it a local mock is started")
+    ap.add_argument("--parallel", type=int, default=1, help="mock: requests served at once (OLLAMA_NUM_PARALLEL)")
+    ap.add_argument("--token-rate", type=float, default=50.0, help="mock tokens per second")
+    ap.add_argument("--first-token-delay", type=float, default=0.2, help="mock prompt eval time (s)")
+    ap.add_argument("--tokens", type=int, default=60, help="mock reply length")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="mock share of HTTP 500 replies")
+    ap.add_argument("--db", help="SQLite file to write history to (default: a temp file)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", help="write machine-readable results here")
+    args = ap.parse_args()
+
+    report = run(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,44 @@
+import argparse
+import atexit
+import json
 import sqlite3
 import os
-from datetime import datetime
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from config import MEMORY_MAX_ROWS_PER_SESSION, MEMORY_MAX_AGE_DAYS, DEFAULT_SESSION
 
 DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "memory.db")
 
+WRITE_BATCH_SIZE = 256
+COMPACT_BATCH_SIZE = 500     # rows deleted per compaction step
+COMPACT_INTERVAL = 60.0      # seconds between age-based compaction passes
+SCHEMA_VERSION = 3
+EXPORT_FETCH_SIZE = 2000     # rows held in memory at a time while exporting
+IMPORT_BATCH_SIZE = 5000     # rows per executemany() while importing
+
+# Failed background writes/compactions (e.g. "database is locked"); read by loadtest.py
+STATS = {"write_errors": 0, "compact_errors": 0}
+
 
 def get_connection():
     """Get a connection to the SQLite database."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")   # WAL + NORMAL: no fsync per commit
+    conn.execute("PRAGMA cache_size=-8000")     # ~8 MB page cache
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA busy_timeout=5000")
     return conn
 
 
-def init_db():
-    """Create the conversations table if it doesn't exist."""
-    conn = get_connection()
+# ──────────────────────────────────────────────
+# 🗄 Schema migrations (PRAGMA user_version)
+# ──────────────────────────────────────────────
+def _migrate_v1(conn):
     conn.execute("""
         CREATE TABLE IF NOT EXISTS conversations (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -24,44 +48,572 @@ def init_db():
             emotion TEXT DEFAULT 'neutral'
         )
     """)
-    conn.commit()
-    conn.close()
 
 
-def save_message(role, message, emotion="neutral"):
+def _migrate_v2(conn):
+    """Sessions, indexes for paged/aged reads, full-text index."""
+    columns = {r["name"] for r in conn.execute("PRAGMA table_info(conversations)")}
+    if "session_id" not in columns:
+        conn.execute(f"ALTER TABLE conversations ADD COLUMN session_id TEXT NOT NULL DEFAULT '{DEFAULT_SESSION}'")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_conversations_session ON conversations (session_id, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_conversations_timestamp ON conversations (timestamp)")
+    if _fts_supported(conn):
+        # External-content table: the text lives once, in `conversations`.
+        # Kept in sync by the writer (no triggers, so bulk deletes stay cheap).
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS conversations_fts
+            USING fts5(message, content='conversations', content_rowid='id')
+        """)
+        conn.execute("INSERT INTO conversations_fts(conversations_fts) VALUES ('rebuild')")
+
+
+def _migrate_v3(conn):
+    """Recall vectors (see recall.py) keyed by conversation row, so retention and clears remove them too."""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS memory_vectors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            role TEXT NOT NULL,
+            message TEXT NOT NULL,
+            model TEXT NOT NULL,
+            vector BLOB NOT NULL,
+            session_id TEXT NOT NULL DEFAULT '{DEFAULT_SESSION}',
+            conversation_id INTEGER
+        )
+    """)
+    columns = {r["name"] for r in conn.execute("PRAGMA table_info(memory_vectors)")}
+    if "session_id" not in columns:
+        conn.execute(f"ALTER TABLE memory_vectors ADD COLUMN session_id TEXT NOT NULL DEFAULT '{DEFAULT_SESSION}'")
+    if "conversation_id" not in columns:
+        conn.execute("ALTER TABLE memory_vectors ADD COLUMN conversation_id INTEGER")
+        # Older vectors only carry the text: link each to the newest matching
+        # message through an indexed temp table (no per-vector table scan)
+        conn.execute("""
+            CREATE TEMP TABLE _vector_links AS
+            SELECT session_id, role, message, MAX(id) AS id FROM conversations GROUP BY session_id, role, message
+        """)
+        conn.execute("CREATE INDEX temp._vector_links_key ON _vector_links (session_id, role, message)")
+        conn.execute("""
+            UPDATE memory_vectors SET conversation_id = (
+                SELECT l.id FROM _vector_links l
+                WHERE l.session_id = memory_vectors.session_id
+                  AND l.role = memory_vectors.role AND l.message = memory_vectors.message
+            )
+        """)
+        conn.execute("DROP TABLE temp._vector_links")
+        # Their message was already deleted (cleared or expired)
+        conn.execute("DELETE FROM memory_vectors WHERE conversation_id IS NULL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_memory_vectors_conversation ON memory_vectors (conversation_id)")
+
+
+MIGRATIONS = [_migrate_v1, _migrate_v2, _migrate_v3]
+
+
+def _fts_supported(conn):
+    try:
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp._fts_probe USING fts5(x)")
+        conn.execute("DROP TABLE temp._fts_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def _has_fts(conn):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'conversations_fts'"
+    ).fetchone() is not None
+
+
+def migrate(conn):
+    """Bring the database up to SCHEMA_VERSION; each step runs in its own transaction."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target in range(version + 1, SCHEMA_VERSION + 1):
+        with conn:
+            MIGRATIONS[target - 1](conn)
+            conn.execute(f"PRAGMA user_version = {target}")
+
+
+class _Store:
+    """
+    One long-lived read connection plus a background writer thread.
+    Writes are queued in memory and committed in batches by the writer, so
+    callers (the Qt GUI thread) never wait on SQLite. Reads merge the rows
+    still waiting in the queue, so history is always up to date.
+    When the queue is empty the writer also enforces the retention limits,
+    a few hundred rows at a time.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.write_conn = get_connection()
+        migrate(self.write_conn)
+        self.fts = _has_fts(self.write_conn)
+        self.read_conn = get_connection()
+        self.read_lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.pending = []                       # rows not yet committed, oldest first
+        self.cond = threading.Condition()       # guards `pending` and `busy`
+        self.busy = False
+        self.closed = False
+        self.dirty_sessions = set()             # sessions that may be over MEMORY_MAX_ROWS_PER_SESSION
+        self.next_age_check = 0.0
+        self.writer = threading.Thread(target=self._write_loop, name="memory-writer", daemon=True)
+        self.writer.start()
+
+    def enqueue(self, row):
+        with self.cond:
+            self.pending.append(row)
+            self.cond.notify_all()
+
+    def _write_loop(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.closed:
+                    if self._has_compaction_work():
+                        break
+                    wait = max(0.1, self.next_age_check - time.monotonic()) if MEMORY_MAX_AGE_DAYS else None
+                    self.cond.wait(timeout=wait)
+                if not self.pending and self.closed:
+                    return
+                batch = self.pending[:WRITE_BATCH_SIZE]
+                self.busy = bool(batch)
+            if not batch:
+                self._compact_step()
+                continue
+            ids = []
+            try:
+                with self.write_lock, self.write_conn:
+                    ids = self._insert(batch)
+            except Exception as e:
+                STATS["write_errors"] += 1
+                print(f"[Memory Error] {e}")
+            with self.cond:
+                # Committed rows are now visible to readers; drop them from the queue
+                del self.pending[:len(batch)]
+                self.busy = False
+                self.dirty_sessions.update(row[4] for row in batch)
+                self.cond.notify_all()
+            for row_id, (_, role, message, emotion, session) in zip(ids, batch):
+                _notify(_save_listeners, role, message, emotion, session=session, row_id=row_id)
+
+    def _insert(self, batch):
+        """Insert a batch; returns the new row ids in batch order."""
+        conn = self.write_conn
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM conversations").fetchone()[0]
+        conn.executemany(
+            "INSERT INTO conversations (timestamp, role, message, emotion, session_id) VALUES (?, ?, ?, ?, ?)",
+            batch,
+        )
+        if self.fts:
+            conn.execute(
+                "INSERT INTO conversations_fts (rowid, message) SELECT id, message FROM conversations WHERE id > ?",
+                (last_id,),
+            )
+        # AUTOINCREMENT ids only grow, so everything above last_id is this batch
+        return [r[0] for r in conn.execute("SELECT id FROM conversations WHERE id > ? ORDER BY id", (last_id,))]
+
+    def delete_rows(self, where, params=()):
+        """
+        Delete rows matching `where` with their FTS entries and recall vectors.
+        Caller holds write_lock + transaction. Returns the deleted ids.
+        """
+        conn = self.write_conn
+        ids = [r[0] for r in conn.execute(f"SELECT id FROM conversations WHERE {where}", params)]
+        if not ids:
+            return ids
+        if self.fts:
+            conn.execute(
+                "INSERT INTO conversations_fts (conversations_fts, rowid, message) "
+                f"SELECT 'delete', id, message FROM conversations WHERE {where}",
+                params,
+            )
+        conn.execute(
+            f"DELETE FROM memory_vectors WHERE conversation_id IN (SELECT id FROM conversations WHERE {where})",
+            params,
+        )
+        conn.execute(f"DELETE FROM conversations WHERE {where}", params)
+        return ids
+
+    # ── retention ──
+    def _has_compaction_work(self):
+        return bool(self.dirty_sessions) or (MEMORY_MAX_AGE_DAYS and time.monotonic() >= self.next_age_check)
+
+    def _compact_step(self):
+        """Delete at most COMPACT_BATCH_SIZE expired rows; more work is picked up on the next idle pass."""
+        try:
+            with self.write_lock, self.write_conn:
+                if self.dirty_sessions:
+                    with self.cond:
+                        session = self.dirty_sessions.pop()
+                    deleted = self._trim_session(session)
+                    if len(deleted) >= COMPACT_BATCH_SIZE:
+                        with self.cond:
+                            self.dirty_sessions.add(session)
+                else:
+                    cutoff = (datetime.now() - timedelta(days=MEMORY_MAX_AGE_DAYS)).isoformat()
+                    deleted = self.delete_rows(
+                        "id IN (SELECT id FROM conversations WHERE timestamp < ? ORDER BY timestamp, id LIMIT ?)",
+                        (cutoff, COMPACT_BATCH_SIZE),
+                    )
+                    if len(deleted) < COMPACT_BATCH_SIZE:
+                        self.next_age_check = time.monotonic() + COMPACT_INTERVAL
+        except Exception as e:
+            STATS["compact_errors"] += 1
+            print(f"[Memory Error] {e}")
+            self.next_age_check = time.monotonic() + COMPACT_INTERVAL
+            return
+        if deleted:
+            _notify(_delete_listeners, deleted)
+
+    def _trim_session(self, session):
+        if not MEMORY_MAX_ROWS_PER_SESSION:
+            return []
+        row = self.write_conn.execute(
+            "SELECT id FROM conversations WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?",
+            (session, MEMORY_MAX_ROWS_PER_SESSION),
+        ).fetchone()
+        if row is None:
+            return []
+        return self.delete_rows(
+            "id IN (SELECT id FROM conversations WHERE session_id = ? AND id <= ? ORDER BY id LIMIT ?)",
+            (session, row["id"], COMPACT_BATCH_SIZE),
+        )
+
+    def flush(self, timeout=None):
+        """Block until every queued row is committed."""
+        with self.cond:
+            return self.cond.wait_for(lambda: not self.pending and not self.busy, timeout)
+
+    def close(self):
+        with self.cond:
+            if self.closed:
+                return
+            self.closed = True
+            self.cond.notify_all()
+        self.writer.join()
+        self.read_conn.close()
+        self.write_conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+_save_listeners = []
+_clear_listeners = []
+_delete_listeners = []
+
+
+def _notify(listeners, *args, **kwargs):
+    for listener in listeners:
+        try:
+            listener(*args, **kwargs)
+        except Exception as e:
+            print(f"[Memory Error] {e}")
+
+
+def _get_store():
+    global _store
+    with _store_lock:
+        if _store is None or _store.closed or _store.path != DB_PATH:
+            if _store is not None:
+                _store.close()
+            _store = _Store(DB_PATH)
+        return _store
+
+
+def init_db():
+    """Create or migrate the database schema."""
+    _get_store()
+
+
+def save_message(role, message, emotion="neutral", session=DEFAULT_SESSION):
     """
-    Save a single message to the database.
+    Queue a single message for the background writer (returns immediately).
     role: 'user' or 'assistant'
     """
-    conn = get_connection()
-    conn.execute(
-        "INSERT INTO conversations (timestamp, role, message, emotion) VALUES (?, ?, ?, ?)",
-        (datetime.now().isoformat(), role, message, emotion),
-    )
-    conn.commit()
-    conn.close()
+    _get_store().enqueue((datetime.now().isoformat(), role, message, emotion, session))
 
 
-def get_recent_history(n=10):
+def on_save(listener):
     """
-    Get the last n conversation exchanges as a list of dicts.
+    Register listener(role, message, emotion, session=..., row_id=...), called
+    on the writer thread for every saved message once it is committed.
+    """
+    if listener not in _save_listeners:
+        _save_listeners.append(listener)
+
+
+def on_clear(listener):
+    """Register listener(session), called after clear_memory() (session None: every session)."""
+    if listener not in _clear_listeners:
+        _clear_listeners.append(listener)
+
+
+def on_delete(listener):
+    """Register listener(ids), called with the conversation ids each retention step deleted."""
+    if listener not in _delete_listeners:
+        _delete_listeners.append(listener)
+
+
+def _as_dict(row):
+    return {"role": row["role"], "message": row["message"], "emotion": row["emotion"]}
+
+
+def get_recent_history(n=10, session=DEFAULT_SESSION):
+    """
+    Get the last n conversation exchanges of a session as a list of dicts.
     Returns: [{"role": "user"/"assistant", "message": "...", "emotion": "..."}]
     """
-    conn = get_connection()
-    rows = conn.execute(
-        "SELECT role, message, emotion FROM conversations ORDER BY id DESC LIMIT ?",
-        (n,),
-    ).fetchall()
-    conn.close()
+    store = _get_store()
+    with store.cond:
+        # Wait out a batch that is mid-commit (fast with WAL), then hold the
+        # queue lock so no row is seen twice or missed between DB and queue.
+        store.cond.wait_for(lambda: not store.busy)
+        queued = [row for row in store.pending if row[4] == session][-n:] if n > 0 else []
+        need = n - len(queued)
+        rows = []
+        if need > 0:
+            with store.read_lock:
+                rows = store.read_conn.execute(
+                    "SELECT role, message, emotion FROM conversations WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                    (session, need),
+                ).fetchall()
 
     # Reverse so oldest first (chronological order)
-    history = [{"role": r["role"], "message": r["message"], "emotion": r["emotion"]} for r in reversed(rows)]
+    history = [_as_dict(r) for r in reversed(rows)]
+    history += [{"role": role, "message": message, "emotion": emotion} for _, role, message, emotion, _ in queued]
     return history
 
 
-def clear_memory():
-    """Clear all conversation history."""
+def get_history_page(session=DEFAULT_SESSION, before_id=None, limit=50):
+    """
+    One page of stored history, newest first, using keyset paging on
+    (session_id, id) so deep pages cost the same as the first one.
+    Returns (rows, next_before_id); next_before_id is None on the last page.
+    """
+    store = _get_store()
+    store.flush(timeout=1.0)
+    sql = "SELECT id, timestamp, role, message, emotion FROM conversations WHERE session_id = ?"
+    params = [session]
+    if before_id is not None:
+        sql += " AND id < ?"
+        params.append(before_id)
+    sql += " ORDER BY id DESC LIMIT ?"
+    params.append(limit)
+    with store.read_lock:
+        rows = [dict(r) for r in store.read_conn.execute(sql, params).fetchall()]
+    next_before = rows[-1]["id"] if len(rows) == limit else None
+    return rows, next_before
+
+
+def _fts_query(text):
+    # Quote every term so user text cannot be parsed as FTS syntax
+    terms = [t.replace('"', '""') for t in (text or "").split()]
+    return " ".join(f'"{t}"' for t in terms if t)
+
+
+def search_messages(query, session=None, limit=20):
+    """Full-text search over stored messages, best match first (LIKE scan if FTS5 is missing)."""
+    store = _get_store()
+    store.flush(timeout=1.0)
+    where = "" if session is None else " AND c.session_id = ?"
+    with store.read_lock:
+        if store.fts:
+            match = _fts_query(query)
+            if not match:
+                return []
+            params = [match] + ([session] if session is not None else []) + [limit]
+            rows = store.read_conn.execute(
+                "SELECT c.id, c.session_id, c.timestamp, c.role, c.message, c.emotion "
+                "FROM conversations_fts f JOIN conversations c ON c.id = f.rowid "
+                f"WHERE conversations_fts MATCH ?{where} ORDER BY f.rank LIMIT ?",
+                params,
+            ).fetchall()
+        else:
+            params = [f"%{query}%"] + ([session] if session is not None else []) + [limit]
+            rows = store.read_conn.execute(
+                "SELECT c.id, c.session_id, c.timestamp, c.role, c.message, c.emotion FROM conversations c "
+                f"WHERE c.message LIKE ?{where} ORDER BY c.id DESC LIMIT ?",
+                params,
+            ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def clear_memory(session=None):
+    """Clear the history of one session, or of every session."""
+    store = _get_store()
+    store.flush()
+    with store.write_lock, store.write_conn:
+        if session is None:
+            # Unqualified DELETE lets SQLite truncate the table instead of visiting rows
+            store.write_conn.execute("DELETE FROM conversations")
+            store.write_conn.execute("DELETE FROM memory_vectors")
+            if store.fts:
+                store.write_conn.execute("INSERT INTO conversations_fts (conversations_fts) VALUES ('delete-all')")
+        else:
+            store.delete_rows("session_id = ?", (session,))
+    # Derived state (recall matrix, cached replies) must forget the same messages
+    _notify(_clear_listeners, session)
+
+
+# ──────────────────────────────────────────────
+# 📦 Bulk export / import (JSONL, one message per line)
+# ──────────────────────────────────────────────
+def export_jsonl(path, session=None):
+    """
+    Stream conversations (oldest first) to a JSONL file ('-' = stdout).
+    Rows are fetched EXPORT_FETCH_SIZE at a time, so memory use does not grow
+    with the table. Returns the number of rows written.
+    """
+    store = _get_store()
+    store.flush()
+    # Own connection: a long export must not hold the read lock the GUI uses
     conn = get_connection()
-    conn.execute("DELETE FROM conversations")
-    conn.commit()
-    conn.close()
+    sql = "SELECT id, session_id, timestamp, role, message, emotion FROM conversations"
+    params = ()
+    if session is not None:
+        sql += " WHERE session_id = ?"
+        params = (session,)
+    out = sys.stdout if path == "-" else open(path, "w", encoding="utf-8")
+    count = 0
+    try:
+        cursor = conn.execute(sql + " ORDER BY id", params)
+        while True:
+            rows = cursor.fetchmany(EXPORT_FETCH_SIZE)
+            if not rows:
+                break
+            out.write("".join(json.dumps(dict(r), ensure_ascii=False) + "\n" for r in rows))
+            count += len(rows)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        conn.close()
+    return count
+
+
+def _import_rows(f, session):
+    now = datetime.now().isoformat()
+    for number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+            role, message = item["role"], item["message"]
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"line {number}: {e!r}") from None
+        yield (
+            item.get("timestamp") or now,
+            role,
+            message,
+            item.get("emotion") or "neutral",
+            session or item.get("session_id") or DEFAULT_SESSION,
+        )
+
+
+def _insert_rows(conn, batch, sessions):
+    if batch:
+        conn.executemany(
+            "INSERT INTO conversations (timestamp, role, message, emotion, session_id) VALUES (?, ?, ?, ?, ?)",
+            batch,
+        )
+        sessions.update(row[4] for row in batch)
+    return len(batch)
+
+
+def import_jsonl(path, session=None, batch_size=IMPORT_BATCH_SIZE, defer_indexes=True):
+    """
+    Bulk-load a JSONL export ('-' = stdin): role and message are required,
+    timestamp, emotion and session_id are optional (`session` overrides the
+    latter; ids are not kept). Everything runs in one transaction with
+    batched executemany(); with defer_indexes the conversation indexes are
+    dropped and rebuilt once at the end, and only the new rows are added to
+    the full-text index. A bad line rolls the whole import back.
+    Save listeners (semantic recall) are not called. Returns rows imported.
+    """
+    store = _get_store()
+    store.flush()
+    source = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    count = 0
+    sessions = set()
+    try:
+        with store.write_lock:
+            conn = store.write_conn
+            with conn:
+                conn.execute("BEGIN")  # DDL below must roll back with the inserts
+                indexes = conn.execute(
+                    "SELECT name, sql FROM sqlite_master "
+                    "WHERE type = 'index' AND tbl_name = 'conversations' AND sql IS NOT NULL"
+                ).fetchall() if defer_indexes else []
+                for index in indexes:
+                    conn.execute(f'DROP INDEX "{index["name"]}"')
+                last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM conversations").fetchone()[0]
+                batch = []
+                for row in _import_rows(source, session):
+                    batch.append(row)
+                    if len(batch) >= batch_size:
+                        count += _insert_rows(conn, batch, sessions)
+                        batch = []
+                count += _insert_rows(conn, batch, sessions)
+                for index in indexes:
+                    conn.execute(index["sql"])
+                if store.fts:
+                    conn.execute(
+                        "INSERT INTO conversations_fts (rowid, message) SELECT id, message FROM conversations WHERE id > ?",
+                        (last_id,),
+                    )
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    # Imported sessions may now be over the retention limit; the writer trims them when idle
+    with store.cond:
+        store.dirty_sessions.update(sessions)
+        store.cond.notify_all()
+    return count
+
+
+def flush():
+    """Wait until all queued messages are written."""
+    if _store is not None:
+        _store.flush()
+
+
+def close():
+    """Flush pending writes and close the connections (called at shutdown)."""
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
+
+
+atexit.register(close)
+
+
+def main():
+    global DB_PATH
+    ap = argparse.ArgumentParser(description="Export or bulk-import conversation history as JSONL")
+    ap.add_argument("--db", default=DB_PATH, help="database file (default: memory.db next to this script)")
+    sub = ap.add_subparsers(dest="command", required=True)
+    exp = sub.add_parser("export", help="write every message to a JSONL file")
+    exp.add_argument("path", help="output file, '-' for stdout")
+    exp.add_argument("--session", help="only this session")
+    imp = sub.add_parser("import", help="append messages from a JSONL file")
+    imp.add_argument("path", help="input file, '-' for stdin")
+    imp.add_argument("--session", help="store every row under this session")
+    imp.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    imp.add_argument("--keep-indexes", action="store_true", help="update indexes row by row instead of rebuilding")
+    args = ap.parse_args()
+    DB_PATH = os.path.abspath(args.db)
+    start = time.perf_counter()
+    if args.command == "export":
+        count = export_jsonl(args.path, args.session)
+        verb = "Exported"
+    else:
+        count = import_jsonl(args.path, args.session, args.batch_size, defer_indexes=not args.keep_indexes)
+        verb = "Imported"
+    close()
+    # Report on stderr so 'export -' output stays clean JSONL
+    print(f"{verb} {count} messages in {time.perf_counter() - start:.2f}s ({DB_PATH})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Local stand-in for the Ollama HTTP API, used by bench.py and loadtest.py.
+
+Implements /api/tags, /api/ps, /api/generate (streaming NDJSON or single
+JSON), /api/embeddings. Token rate, first-token delay, reply length and
+error injection are configurable; run it standalone with
+`python mock_ollama.py --port 11434` to point the app at it.
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "sure I can help with that let us look at it step by step first think about "
+    "what you already know then try a small example and check the result again"
+).split()
+
+
+def _fake_tokens(n, rng):
+    out = []
+    for i in range(n):
+        word = rng.choice(WORDS)
+        end = "." if (i + 1) % 9 == 0 else ""
+        out.append((" " if i else "") + word + end)
+    return out
+
+
+def _fake_embedding(text, dim=64):
+    vec = [0.0] * dim
+    for word in (text or "").lower().split():
+        h = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+        vec[h % dim] += 1.0 if (h >> 63) & 1 else -1.0
+    return vec
+
+
+class MockOllama:
+    def __init__(self, models=("gemma3:1b", "qwen2.5:3b-instruct"), token_rate=100.0,
+                 first_token_delay=0.05, tokens=40, error_rate=0.0, stream_error_rate=0.0,
+                 parallel=0, load_delay=0.0, seed=None, host="127.0.0.1", port=0):
+        self.models = list(models)
+        self.token_rate = token_rate              # tokens per second while streaming
+        self.first_token_delay = first_token_delay  # prompt evaluation time (s)
+        self.tokens = tokens                      # reply length in tokens
+        self.error_rate = error_rate              # share of generate calls answered with HTTP 500
+        self.stream_error_rate = stream_error_rate  # share of streams that send an error frame
+        self.load_delay = load_delay              # extra delay the first time a model is used
+        self.rng = random.Random(seed)
+        self.loaded = set()
+        self.stats = {"generate": 0, "errors": 0, "cancelled": 0, "embeddings": 0, "queue_wait": []}
+        self._lock = threading.Lock()
+        # parallel > 0 emulates OLLAMA_NUM_PARALLEL: extra requests queue for a slot
+        self._slots = threading.Semaphore(parallel) if parallel > 0 else None
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="mock-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _roll(self, rate):
+        with self._lock:
+            return rate > 0 and self.rng.random() < rate
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _chunk(self, payload):
+                data = (json.dumps(payload) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def _body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b"{}"
+                try:
+                    return json.loads(raw or b"{}")
+                except ValueError:
+                    return {}
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._json(200, {"models": [{"name": m} for m in mock.models]})
+                elif self.path == "/api/ps":
+                    self._json(200, {"models": [{"name": m} for m in sorted(mock.loaded)]})
+                else:
+                    self._json(404, {"error": "not found"})
+
+            def do_POST(self):
+                body = self._body()
+                if self.path == "/api/embeddings":
+                    with mock._lock:
+                        mock.stats["embeddings"] += 1
+                    self._json(200, {"embedding": _fake_embedding(body.get("prompt"))})
+                elif self.path == "/api/generate":
+                    self._generate(body)
+                else:
+                    self._json(404, {"error": "not found"})
+
+            def _generate(self, body):
+                model = body.get("model") or ""
+                with mock._lock:
+                    mock.stats["generate"] += 1
+                if model not in mock.models:
+                    self._json(404, {"error": f"model '{model}' not found"})
+                    return
+                if mock._roll(mock.error_rate):
+                    with mock._lock:
+                        mock.stats["errors"] += 1
+                    self._json(500, {"error": "injected failure"})
+                    return
+                queued_at = time.perf_counter()
+                if mock._slots is not None:
+                    mock._slots.acquire()
+                try:
+                    with mock._lock:
+                        mock.stats["queue_wait"].append(time.perf_counter() - queued_at)
+                    self._run_generation(body, model)
+                finally:
+                    if mock._slots is not None:
+                        mock._slots.release()
+
+            def _run_generation(self, body, model):
+                started = time.perf_counter()
+                with mock._lock:
+                    cold = model not in mock.loaded
+                    mock.loaded.add(model)
+                    rng = random.Random(mock.rng.random())
+                n = mock.tokens
+                num_predict = (body.get("options") or {}).get("num_predict")
+                if isinstance(num_predict, int) and num_predict >= 0:
+                    n = min(n, num_predict)
+                load = mock.load_delay if cold else 0.0
+                time.sleep(load + mock.first_token_delay)
+                tokens = _fake_tokens(n, rng)
+                prompt = body.get("prompt") or ""
+                final = {
+                    "model": model,
+                    "response": "",
+                    "done": True,
+                    "context": list(body.get("context") or []) + list(range(len(prompt.split()) + n)),
+                    "total_duration": 0,
+                    "load_duration": int(load * 1e9),
+                    "prompt_eval_count": len(prompt.split()),
+                    "prompt_eval_duration": int(mock.first_token_delay * 1e9),
+                    "eval_count": n,
+                    "eval_duration": int(n / mock.token_rate * 1e9) if mock.token_rate else 0,
+                }
+                if not body.get("stream", True):
+                    if mock.token_rate:
+                        time.sleep(n / mock.token_rate)
+                    final["response"] = "".join(tokens)
+                    final["total_duration"] = int((time.perf_counter() - started) * 1e9)
+                    self._json(200, final)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                fail_at = rng.randrange(max(n, 1)) if mock._roll(mock.stream_error_rate) else -1
+                try:
+                    for i, tok in enumerate(tokens):
+                        if i == fail_at:
+                            with mock._lock:
+                                mock.stats["errors"] += 1
+                            self._chunk({"error": "injected stream failure"})
+                            break
+                        if i and mock.token_rate:
+                            time.sleep(1.0 / mock.token_rate)
+                        self._chunk({"model": model, "response": tok, "done": False})
+                    else:
+                        final["total_duration"] = int((time.perf_counter() - started) * 1e9)
+                        self._chunk(final)
+                    self.wfile.write(b"0\r\n\r\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    # Client went away mid-stream (e.g. a preempted turn)
+                    with mock._lock:
+                        mock.stats["cancelled"] += 1
+                    self.close_connection = True
+
+        return Handler
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Mock Ollama server")
+    ap.add_argument("--port", type=int, default=11434)
+    ap.add_argument("--token-rate", type=float, default=100.0)
+    ap.add_argument("--first-token-delay", type=float, default=0.05)
+    ap.add_argument("--tokens", type=int, default=40)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--parallel", type=int, default=0)
+    args = ap.parse_args()
+    mock = MockOllama(token_rate=args.token_rate, first_token_delay=args.first_token_delay,
+                      tokens=args.tokens, error_rate=args.error_rate, parallel=args.parallel,
+                      port=args.port)
+    print(f"Mock Ollama listening on {mock.url}")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
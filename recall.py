@@ -0,0 +1,263 @@
+import hashlib
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import memory
+from config import RECALL_QUERY_TIMEOUT, RECALL_EMBED_CACHE
+
+TOKEN_RE = re.compile(r"[\w\u0900-\u097F]+")
+
+
+def _normalize(vec):
+    vec = np.asarray(vec, dtype=np.float32)
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm > 0 else vec
+
+
+class HashEmbedder:
+    """
+    Deterministic, dependency-free stand-in for a real embedding model
+    (feature hashing of words and word pairs). Used by tests/benchmarks and
+    whenever no embedding model is available.
+    """
+
+    def __init__(self, dim=256):
+        self.dim = dim
+        self.name = f"hash-{dim}"
+
+    def embed(self, text, timeout=None):
+        vec = np.zeros(self.dim, dtype=np.float32)
+        # Short ASCII words ("is", "my", "a") are mostly noise for similarity
+        words = [w for w in TOKEN_RE.findall((text or "").lower()) if len(w) > 2 or not w.isascii()]
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vec[h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+        return _normalize(vec)
+
+
+class OllamaEmbedder:
+    """Embeddings from Ollama's /api/embeddings using the shared pooled client."""
+
+    def __init__(self, client, model):
+        self.client = client
+        self.model = model
+        self.name = f"ollama:{model}"
+
+    def embed(self, text, timeout=None):
+        r = self.client.post(
+            "/api/embeddings",
+            json={"model": self.model, "prompt": text},
+            timeout=(2, timeout or 10),
+        )
+        r.raise_for_status()
+        vec = r.json().get("embedding")
+        if not vec:
+            raise RuntimeError("empty embedding")
+        return _normalize(vec)
+
+
+class SemanticMemory:
+    """
+    Vector index over saved messages. Vectors are stored as float32 blobs in
+    the `memory_vectors` table of memory.db (one per conversation row, so
+    memory.py's retention and clears delete them with the message) and
+    mirrored in one contiguous NumPy matrix, so a search is a single
+    matrix-vector product.
+    Messages are embedded on a background thread; add() never blocks.
+    """
+
+    RETRY_AFTER = 60.0  # seconds to back off after the embedder failed
+
+    def __init__(self, embedder):
+        self.embedder = embedder
+        self._lock = threading.Lock()
+        self._conn = None
+        self._reset()
+        self._queue = queue.Queue()
+        self._worker = None
+        self._disabled_until = 0.0
+        # text -> vector: a turn's query is usually the message just queued for
+        # indexing (or a repeat), so only one of them pays for the HTTP call
+        self._vectors = OrderedDict()
+        self._vectors_lock = threading.Lock()
+
+    def _reset(self):
+        self._loaded = False
+        self._matrix = None
+        self._rows = []           # (role, message) aligned with matrix rows
+        self._sessions = np.zeros(64, dtype=np.int32)  # session code per matrix row
+        self._ids = np.zeros(64, dtype=np.int64)       # conversation id per matrix row
+        self._session_codes = {}
+        self._count = 0
+
+    # ── storage ──
+    def _db(self):
+        if self._conn is None:
+            memory.init_db()  # the memory_vectors schema is one of memory.py's migrations
+            self._conn = memory.get_connection()
+        return self._conn
+
+    def _code(self, session):
+        return self._session_codes.setdefault(session, len(self._session_codes))
+
+    def _append(self, role, message, vec, session, row_id):
+        if self._matrix is None:
+            self._matrix = np.zeros((64, vec.shape[0]), dtype=np.float32)
+        elif vec.shape[0] != self._matrix.shape[1]:
+            return
+        if self._count == self._matrix.shape[0]:
+            grown = np.zeros((self._count * 2, self._matrix.shape[1]), dtype=np.float32)
+            grown[:self._count] = self._matrix
+            self._matrix = grown
+        if self._count == self._sessions.shape[0]:
+            self._sessions = np.concatenate([self._sessions, np.zeros_like(self._sessions)])
+            self._ids = np.concatenate([self._ids, np.zeros_like(self._ids)])
+        self._matrix[self._count] = vec
+        self._sessions[self._count] = self._code(session)
+        self._ids[self._count] = row_id
+        self._rows.append((role, message))
+        self._count += 1
+
+    def _load(self):
+        if self._loaded:
+            return
+        rows = self._db().execute(
+            "SELECT role, message, vector, session_id, conversation_id FROM memory_vectors WHERE model = ? ORDER BY id",
+            (self.embedder.name,),
+        ).fetchall()
+        for r in rows:
+            self._append(r["role"], r["message"], np.frombuffer(r["vector"], dtype=np.float32),
+                         r["session_id"], r["conversation_id"])
+        self._loaded = True
+
+    def _embed(self, text, timeout=None):
+        with self._vectors_lock:
+            vec = self._vectors.get(text)
+            if vec is not None:
+                self._vectors.move_to_end(text)
+                return vec
+        if time.monotonic() < self._disabled_until:
+            return None
+        try:
+            vec = self.embedder.embed(text, timeout=timeout)
+        except Exception as e:
+            print(f"[Recall Error] {e}")
+            self._disabled_until = time.monotonic() + self.RETRY_AFTER
+            return None
+        with self._vectors_lock:
+            self._vectors[text] = vec
+            while len(self._vectors) > RECALL_EMBED_CACHE:
+                self._vectors.popitem(last=False)
+        return vec
+
+    # ── indexing ──
+    def _index_loop(self):
+        while True:
+            role, message, session, row_id = self._queue.get()
+            vec = self._embed(message)
+            if vec is None:
+                continue
+            with self._lock:
+                try:
+                    self._load()
+                    with self._db():
+                        # Skipped when the message was cleared or expired while it waited
+                        inserted = self._db().execute(
+                            "INSERT INTO memory_vectors (role, message, model, vector, session_id, conversation_id) "
+                            "SELECT ?, ?, ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM conversations WHERE id = ?)",
+                            (role, message, self.embedder.name, vec.astype(np.float32).tobytes(), session,
+                             row_id, row_id),
+                        ).rowcount
+                    if inserted:
+                        self._append(role, message, vec, session, row_id)
+                except Exception as e:
+                    print(f"[Recall Error] {e}")
+
+    def add(self, role, message, emotion=None, session=memory.DEFAULT_SESSION, row_id=None):
+        """Queue a committed message for embedding (signature matches memory.on_save listeners)."""
+        if not (message or "").strip() or row_id is None:
+            return
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._index_loop, name="recall-index", daemon=True)
+            self._worker.start()
+        self._queue.put((role, message, session, row_id))
+
+    def clear(self, session=None):
+        """Delete the vectors of one session (None: all sessions) and rebuild the matrix from the rest."""
+        with self._lock:
+            with self._db():
+                if session is None:
+                    self._db().execute("DELETE FROM memory_vectors")
+                else:
+                    self._db().execute("DELETE FROM memory_vectors WHERE session_id = ?", (session,))
+            # New arrays rather than in-place edits: a search running outside
+            # the lock keeps the rows list it started with
+            self._reset()
+            self._load()
+
+    def forget(self, ids):
+        """Drop the matrix rows of deleted conversation ids (memory.py already deleted their vectors)."""
+        with self._lock:
+            if not self._loaded or self._count == 0:
+                return
+            keep = np.flatnonzero(~np.isin(self._ids[:self._count], np.fromiter(ids, dtype=np.int64)))
+            if len(keep) == self._count:
+                return
+            size = max(64, len(keep))
+            matrix = np.zeros((size, self._matrix.shape[1]), dtype=np.float32)
+            matrix[:len(keep)] = self._matrix[keep]
+            sessions = np.zeros(size, dtype=np.int32)
+            sessions[:len(keep)] = self._sessions[keep]
+            row_ids = np.zeros(size, dtype=np.int64)
+            row_ids[:len(keep)] = self._ids[keep]
+            self._matrix, self._sessions, self._ids = matrix, sessions, row_ids
+            self._rows = [self._rows[i] for i in keep]
+            self._count = len(keep)
+
+    # ── retrieval ──
+    def search(self, query, k=3, min_score=0.0, exclude=(), session=None):
+        """Top-k stored messages most similar to `query`, best first (optionally one session only)."""
+        if not (query or "").strip():
+            return []
+        with self._lock:
+            try:
+                self._load()
+            except Exception as e:
+                print(f"[Recall Error] {e}")
+                return []
+            if self._count == 0:
+                return []
+        # On the turn's critical path: a slow embedding (e.g. the model is loading) skips recall
+        q = self._embed(query, timeout=RECALL_QUERY_TIMEOUT)
+        if q is None:
+            return []
+        with self._lock:
+            if q.shape[0] != self._matrix.shape[1]:
+                return []
+            scores = self._matrix[:self._count] @ q
+            if session is not None:
+                code = self._session_codes.get(session)
+                if code is None:
+                    return []
+                scores[self._sessions[:self._count] != code] = -np.inf
+            rows = self._rows  # append-only, safe to index outside the lock
+        # Over-fetch a little so excluded/duplicate rows do not starve the result
+        want = min(len(scores), k + len(exclude) + 4)
+        top = np.argpartition(-scores, want - 1)[:want]
+        top = top[np.argsort(-scores[top])]
+        results, seen = [], set(exclude)
+        for i in top:
+            score = float(scores[i])
+            role, message = rows[i]
+            if score < min_score or message in seen:
+                continue
+            seen.add(message)
+            results.append({"role": role, "message": message, "score": score})
+            if len(results) >= k:
+                break
+        return results
@@ -0,0 +1,197 @@
+import threading
+import time
+
+from config import (MODEL_NAME, FAST_MODE, ROUTER_SMALL_MODEL, ROUTER_LARGE_MODEL, ROUTER_TTFT_TARGET,
+                    ROUTER_MIN_TOKENS_PER_SEC, ROUTER_MODELS_TTL, ROUTER_RETRY_AFTER, ROUTER_EWMA_ALPHA)
+
+FAILED_REFRESH_TTL = 5.0   # retry soon when the model list could not be fetched
+
+
+class ModelStats:
+    """EWMA of what one model actually delivered on recent turns."""
+
+    def __init__(self, alpha=ROUTER_EWMA_ALPHA):
+        self.alpha = alpha
+        self.ttft = None            # seconds to first token
+        self.tokens_per_sec = None
+        self.samples = 0
+        self.last_at = 0.0
+
+    def _ewma(self, old, new):
+        return new if old is None else old + self.alpha * (new - old)
+
+    def add(self, ttft=None, tokens_per_sec=None):
+        if ttft is not None:
+            self.ttft = self._ewma(self.ttft, ttft)
+        if tokens_per_sec:
+            self.tokens_per_sec = self._ewma(self.tokens_per_sec, tokens_per_sec)
+        self.samples += 1
+        self.last_at = time.monotonic()
+
+    def to_dict(self):
+        return {"ttft_ms": round(self.ttft * 1000, 1) if self.ttft is not None else None,
+                "tokens_per_sec": round(self.tokens_per_sec, 1) if self.tokens_per_sec else None,
+                "samples": self.samples}
+
+
+class ModelRouter:
+    """
+    Picks the model for a turn.
+    - installed models (/api/tags) and loaded models (/api/ps) are refreshed
+      every `models_ttl` seconds in the background, never cached forever
+    - time-to-first-token and tokens/sec are tracked per model from real turns
+    - long/detailed turns prefer the large model, but fall back to the small
+      one when the large one is over the latency target, or cold while the
+      small one is loaded (on_cold(model) is then called so it can be loaded
+      in the background). A degraded model gets another try after
+      `retry_after` seconds so it can recover.
+    """
+
+    def __init__(self, client, small=ROUTER_SMALL_MODEL, large=ROUTER_LARGE_MODEL, ttft_target=ROUTER_TTFT_TARGET,
+                 min_tokens_per_sec=ROUTER_MIN_TOKENS_PER_SEC, models_ttl=ROUTER_MODELS_TTL,
+                 retry_after=ROUTER_RETRY_AFTER):
+        self.client = client
+        self.small = small
+        self.large = large
+        self.ttft_target = ttft_target
+        self.min_tokens_per_sec = min_tokens_per_sec
+        self.models_ttl = models_ttl
+        self.retry_after = retry_after
+        self.stats = {}
+        self.on_cold = None
+        self._warm_requested = {}
+        self._installed = None
+        self._loaded = set()
+        self._fresh_until = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    # ── model lists ──
+    def refresh(self, timeout=2):
+        """Fetch installed and loaded models now. Keeps the old lists on failure."""
+        ok = False
+        try:
+            r = self.client.get("/api/tags", timeout=timeout)
+            r.raise_for_status()
+            installed = [m.get("name") for m in r.json().get("models", []) if m.get("name")]
+            loaded = set()
+            try:
+                r = self.client.get("/api/ps", timeout=timeout)
+                if r.ok:
+                    loaded = {m.get("name") for m in r.json().get("models", []) if m.get("name")}
+            except Exception:
+                pass
+            with self._lock:
+                self._installed = installed
+                self._loaded = loaded
+            ok = True
+        except Exception as e:
+            print(f"[Router Error] {e}")
+        with self._lock:
+            self._fresh_until = time.monotonic() + (self.models_ttl if ok else FAILED_REFRESH_TTL)
+        return ok
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def _run():
+            try:
+                self.refresh()
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=_run, name="router-refresh", daemon=True).start()
+
+    def _ensure_fresh(self):
+        if self._installed is None and time.monotonic() >= self._fresh_until:
+            self.refresh()  # first use: nothing to fall back on yet
+        elif time.monotonic() >= self._fresh_until:
+            self._refresh_in_background()
+
+    def models(self):
+        self._ensure_fresh()
+        with self._lock:
+            return list(self._installed or [])
+
+    def loaded(self):
+        self._ensure_fresh()
+        with self._lock:
+            return set(self._loaded)
+
+    def mark_loaded(self, model):
+        with self._lock:
+            self._loaded.add(model)
+
+    def invalidate(self):
+        """Forget the model lists (e.g. after switching servers)."""
+        with self._lock:
+            self._installed = None
+            self._loaded = set()
+            self._fresh_until = 0.0
+            self.stats = {}
+
+    # ── measurements ──
+    def observe(self, model, ttft=None, data=None):
+        """Record a finished turn: ttft in seconds, data = Ollama's final frame (optional)."""
+        tps = None
+        if data:
+            count, duration = data.get("eval_count"), data.get("eval_duration")
+            if count and duration:
+                tps = count / (duration / 1e9)
+            if ttft is None and data.get("prompt_eval_duration") is not None:
+                # Non-streaming call: model load + prompt evaluation is what a stream would wait for
+                ttft = ((data.get("load_duration") or 0) + data["prompt_eval_duration"]) / 1e9
+        with self._lock:
+            self.stats.setdefault(model, ModelStats()).add(ttft, tps)
+            self._loaded.add(model)
+
+    def _too_slow(self, model):
+        s = self.stats.get(model)
+        if s is None or time.monotonic() - s.last_at > self.retry_after:
+            return False  # unmeasured or stale: give it a (new) chance
+        if s.ttft is not None and s.ttft > self.ttft_target:
+            return True
+        return s.tokens_per_sec is not None and s.tokens_per_sec < self.min_tokens_per_sec
+
+    # ── routing ──
+    def choose(self, is_long):
+        """Model for this turn; MODEL_NAME when neither routed model is installed."""
+        available = set(self.models())
+        wanted = [self.large, self.small] if (is_long or not FAST_MODE) else [self.small, self.large]
+        candidates = [m for m in wanted if m in available]
+        if not candidates:
+            return MODEL_NAME
+        first = candidates[0]
+        if first == self.large and len(candidates) > 1:
+            loaded = self.loaded()
+            with self._lock:
+                slow = self._too_slow(first)
+            cold = first not in loaded and self.small in loaded
+            if cold:
+                self._request_warm(first)
+            if slow or cold:
+                return self.small
+        return first
+
+    def _request_warm(self, model):
+        now = time.monotonic()
+        with self._lock:
+            if self.on_cold is None or now - self._warm_requested.get(model, -self.retry_after) < self.retry_after:
+                return
+            self._warm_requested[model] = now
+        try:
+            self.on_cold(model)
+        except Exception as e:
+            print(f"[Router Error] {e}")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "installed": list(self._installed or []),
+                "loaded": sorted(self._loaded),
+                "stats": {m: s.to_dict() for m, s in self.stats.items()},
+            }
@@ -0,0 +1,451 @@
+"""
+Headless Vi: the brain.py pipeline over HTTP + WebSocket, no Qt.
+
+    python server.py --port 8765
+    open http://127.0.0.1:8765/   (the ui/ front end, talking over /ws)
+
+API
+    GET    /api/health
+    POST   /api/chat      {"session", "message", "stream": true}  -> NDJSON events
+    GET    /api/history   ?session=&n=20&before=<id>   (newest first, keyset paged)
+    DELETE /api/history   ?session=   (one session only; default: the default session)
+    GET    /api/search    ?q=&session=   full-text search within one session
+    GET    /ws            ?session=   send {"type": "message" | "typing", "text": ...}
+
+Events: {"type": "emotion"}, {"type": "delta", "text"}, {"type": "done",
+"response", "emotion"}, {"type": "error", "status", "message"}.
+A new message on a session cancels the turn still running on it.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+
+import aiohttp
+from aiohttp import web
+
+import brain
+import fastpath
+import memory
+from brain import (plan_turn, build_generate_request, remember_context, note_turn, record_generation,
+                   reset_context, parse_response, OFFLINE_REPLY, SERVER_ERROR_REPLY, STREAM_ERROR_REPLY)
+from config import (SERVER_HOST, SERVER_PORT, SERVER_MAX_CONCURRENCY, SERVER_MAX_QUEUE, SERVER_QUEUE_TIMEOUT,
+                    SERVER_SESSION_TTL, CONTEXT_HISTORY_MESSAGES)
+from tracing import Trace
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BUSY_REPLY = "Khup lok ekdam bolat aahet 😅 Ek second thaamb, parat try kar."
+
+
+class ServerBusy(Exception):
+    """No generation slot free and the wait queue is full (or the wait timed out)."""
+
+
+class AsyncOllama:
+    """
+    aiohttp client for /api/generate with bounded concurrency: at most
+    `max_concurrency` generations in flight, at most `max_queue` waiting.
+    Health and the circuit breaker are shared with brain.CLIENT.
+    """
+
+    def __init__(self, max_concurrency=SERVER_MAX_CONCURRENCY, max_queue=SERVER_MAX_QUEUE,
+                 queue_timeout=SERVER_QUEUE_TIMEOUT):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.waiting = 0
+        self.active = 0
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._http = None
+
+    async def start(self):
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency * 2, keepalive_timeout=60)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=5, sock_read=120)
+        self._http = aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    async def close(self):
+        if self._http is not None:
+            await self._http.close()
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.waiting >= self.max_queue:
+            raise ServerBusy("generation queue full")
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise ServerBusy("timed out waiting for a generation slot")
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._slots.release()
+
+    async def generate(self, body, on_slot=None):
+        """Yield the NDJSON frames of a streaming /api/generate call; on_slot() runs once a slot is granted."""
+        async with self.slot():
+            if on_slot is not None:
+                on_slot()
+            try:
+                async with self._http.post(brain.CLIENT.url("/api/generate"), json=body) as resp:
+                    if resp.status != 200:
+                        text = await resp.text()
+                        if resp.status >= 500:
+                            brain.CLIENT.record_failure()
+                        yield {"error": f"HTTP {resp.status}: {text[:200]}", "http_status": resp.status}
+                        return
+                    brain.CLIENT.record_success()
+                    async for raw in resp.content:
+                        line = raw.strip()
+                        if not line:
+                            continue
+                        try:
+                            yield json.loads(line)
+                        except ValueError:
+                            continue
+            except aiohttp.ClientConnectionError:
+                brain.CLIENT.record_failure()
+                raise
+
+    async def warm(self, body):
+        """
+        A type-ahead warmup (brain.PrefixWarmer): sent only when a generation
+        slot is free right now, so it never queues ahead of or beside real turns.
+        """
+        if self._slots.locked() or self.waiting:
+            return False
+        try:
+            async with self.slot():
+                async with self._http.post(brain.CLIENT.url("/api/generate"), json=body) as resp:
+                    await resp.read()
+                    if resp.status >= 500:
+                        brain.CLIENT.record_failure()
+                    elif resp.status == 200:
+                        brain.CLIENT.record_success()
+                    return resp.status == 200
+        except ServerBusy:
+            return False
+        except aiohttp.ClientConnectionError:
+            brain.CLIENT.record_failure()
+            return False
+
+    def stats(self):
+        return {"active": self.active, "waiting": self.waiting,
+                "max_concurrency": self.max_concurrency, "max_queue": self.max_queue}
+
+
+# ──────────────────────────────────────────────
+# 👥 Sessions
+# ──────────────────────────────────────────────
+class SessionState:
+    def __init__(self, session_id):
+        self.id = session_id
+        self.task = None
+        self.last_seen = time.monotonic()
+
+    def claim(self, task):
+        """Make `task` the running turn; a turn still running is cancelled (preempted)."""
+        if self.task is not None and self.task is not task and not self.task.done():
+            self.task.cancel()
+        self.task = task
+        self.last_seen = time.monotonic()
+
+
+def get_session(app, session_id=None):
+    sessions = app["sessions"]
+    now = time.monotonic()
+    for sid in [s for s, st in sessions.items() if now - st.last_seen > SERVER_SESSION_TTL]:
+        sessions.pop(sid)
+        reset_context(sid)
+        brain.WARMER.cancel(sid)
+    session_id = session_id or uuid.uuid4().hex
+    state = sessions.get(session_id)
+    if state is None:
+        state = sessions[session_id] = SessionState(session_id)
+    state.last_seen = now
+    return state
+
+
+# ──────────────────────────────────────────────
+# 💬 One turn
+# ──────────────────────────────────────────────
+async def run_turn(app, session_id, text):
+    """
+    Async twin of brain.stream_response: yields UI events for one turn.
+    Raises ServerBusy before yielding anything when there is no capacity;
+    the user's message is only saved once the turn is accepted, so a
+    rejected turn leaves nothing behind in history.
+    """
+    trace = Trace("server_turn", session=session_id, input_chars=len(text))
+
+    def save_user():
+        memory.save_message("user", text, session=session_id)
+
+    try:
+        instant = fastpath.lookup(text, session_id)
+        if instant is not None:
+            reply, emotion, source = instant
+            emotion = emotion or brain.detect_emotion_from_user(text)
+            trace.set(source=source)
+            note_turn(session_id, text, reply)
+            save_user()
+            memory.save_message("assistant", reply, emotion, session_id)
+            yield {"type": "emotion", "emotion": emotion}
+            yield {"type": "delta", "text": reply}
+            yield {"type": "done", "response": reply, "emotion": emotion}
+            return
+
+        if not await asyncio.to_thread(brain.ollama_up, 2):
+            trace.set(source="offline")
+            save_user()
+            yield {"type": "done", "response": OFFLINE_REPLY, "emotion": "neutral"}
+            return
+
+        # The router may fetch /api/tags and /api/ps on first use; never block the loop on it
+        plan = await asyncio.to_thread(plan_turn, text)
+        with trace.span("history"):
+            history = await asyncio.to_thread(memory.get_recent_history, CONTEXT_HISTORY_MESSAGES, session_id)
+        # Recall embeds the query over HTTP, so keep it off the event loop
+        body = await asyncio.to_thread(build_generate_request, text, history, plan, session_id, trace, True)
+        trace.set(model=plan.model, source="model")
+
+        parts = []
+        error = None
+        gen_start = time.perf_counter()
+        async for data in app["ollama"].generate(body, on_slot=save_user):
+            if "error" in data:
+                error = data["error"]
+                trace.set(error=error)
+                continue
+            chunk = data.get("response", "")
+            if chunk:
+                if not parts:
+                    first_token_at = time.perf_counter()
+                    trace.add_span("generate.first_token", gen_start, first_token_at)
+                    yield {"type": "emotion", "emotion": plan.visual_emotion}
+                parts.append(chunk)
+                yield {"type": "delta", "text": chunk}
+            if data.get("done"):
+                record_generation(trace, data)
+                remember_context(session_id, plan, data)
+                brain.ROUTER.observe(plan.model, first_token_at - gen_start if parts else None, data)
+                break
+        trace.add_span("generate.total", gen_start, chunks=len(parts))
+
+        if not parts:
+            reply = SERVER_ERROR_REPLY if error and error.startswith("HTTP") else STREAM_ERROR_REPLY
+            yield {"type": "done", "response": reply, "emotion": "neutral"}
+            return
+        response, _ = parse_response("".join(parts))
+        if not error:
+            fastpath.remember(text, response, session_id)
+        memory.save_message("assistant", response, plan.reply_emotion, session_id)
+        trace.set(reply_chars=len(response))
+        yield {"type": "done", "response": response, "emotion": plan.reply_emotion}
+    except asyncio.CancelledError:
+        trace.set(cancelled=True)
+        raise
+    except ServerBusy:
+        trace.set(error="busy")
+        raise
+    except Exception as e:
+        print(f"[Server Error] {e}")
+        trace.set(error=str(e))
+        yield {"type": "done", "response": STREAM_ERROR_REPLY, "emotion": "neutral"}
+    finally:
+        trace.finish()
+
+
+# ──────────────────────────────────────────────
+# 🌐 Handlers
+# ──────────────────────────────────────────────
+def _busy_event():
+    return {"type": "error", "status": 503, "message": BUSY_REPLY}
+
+
+async def health(request):
+    up = await asyncio.to_thread(brain.ollama_up, 2)
+    return web.json_response({
+        "ollama": up,
+        "sessions": len(request.app["sessions"]),
+        "generation": request.app["ollama"].stats(),
+        "models": brain.ROUTER.snapshot(),
+        "fastpath": fastpath.stats(),
+    })
+
+
+async def chat(request):
+    try:
+        payload = await request.json()
+    except ValueError:
+        return web.json_response({"error": "expected a JSON body"}, status=400)
+    text = (payload.get("message") or "").strip()
+    if not text:
+        return web.json_response({"error": "message is empty"}, status=400)
+    state = get_session(request.app, payload.get("session"))
+    state.claim(asyncio.current_task())
+    stream = payload.get("stream", True)
+
+    resp = None
+    done = None
+    try:
+        async for event in run_turn(request.app, state.id, text):
+            if event["type"] == "done":
+                done = event
+            if not stream:
+                continue
+            if resp is None:
+                resp = web.StreamResponse(headers={"Content-Type": "application/x-ndjson", "X-Session": state.id})
+                await resp.prepare(request)
+            await resp.write((json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8"))
+    except ServerBusy:
+        if resp is None:
+            return web.json_response({**_busy_event(), "session": state.id}, status=503, headers={"Retry-After": "1"})
+        await resp.write((json.dumps(_busy_event()) + "\n").encode("utf-8"))
+    if resp is not None:
+        await resp.write_eof()
+        return resp
+    return web.json_response({**(done or {}), "session": state.id})
+
+
+async def history(request):
+    """Newest first, keyset paged: pass the returned `next` as `before` for the following page."""
+    session = request.query.get("session", memory.DEFAULT_SESSION)
+    try:
+        n = max(1, min(int(request.query.get("n", 20)), 500))
+        before = int(request.query["before"]) if request.query.get("before") else None
+    except ValueError:
+        return web.json_response({"error": "n and before must be integers"}, status=400)
+    rows, next_before = await asyncio.to_thread(memory.get_history_page, session, before, n)
+    return web.json_response({"session": session, "messages": rows, "next": next_before})
+
+
+async def search(request):
+    query = (request.query.get("q") or "").strip()
+    if not query:
+        return web.json_response({"error": "q is required"}, status=400)
+    # Always one session: a search across sessions would expose other clients' conversations
+    session = request.query.get("session") or memory.DEFAULT_SESSION
+    rows = await asyncio.to_thread(memory.search_messages, query, session, 20)
+    return web.json_response({"session": session, "results": rows})
+
+
+async def clear_history(request):
+    # One session at a time: a client must never be able to wipe everyone's history
+    session = request.query.get("session") or memory.DEFAULT_SESSION
+    await asyncio.to_thread(memory.clear_memory, session)
+    reset_context(session)
+    return web.json_response({"ok": True, "session": session})
+
+
+async def _pump(app, ws, state, text):
+    try:
+        async for event in run_turn(app, state.id, text):
+            await ws.send_json(event)
+    except ServerBusy:
+        await ws.send_json(_busy_event())
+    except ConnectionResetError:
+        pass
+
+
+async def websocket(request):
+    ws = web.WebSocketResponse(heartbeat=30)
+    await ws.prepare(request)
+    state = get_session(request.app, request.query.get("session"))
+    await ws.send_json({"type": "session", "session": state.id})
+    try:
+        async for msg in ws:
+            if msg.type != aiohttp.WSMsgType.TEXT:
+                continue
+            try:
+                data = json.loads(msg.data)
+            except ValueError:
+                continue
+            kind = data.get("type")
+            if kind == "message":
+                text = (data.get("text") or "").strip()
+                if text:
+                    brain.WARMER.cancel(state.id)
+                    state.claim(asyncio.create_task(_pump(request.app, ws, state, text)))
+            elif kind == "typing":
+                if state.task is None or state.task.done():
+                    brain.warm_prefix(data.get("text") or "", state.id)
+            elif kind == "cancel":
+                state.claim(None)
+            elif kind == "clear":
+                await asyncio.to_thread(memory.clear_memory, state.id)
+                reset_context(state.id)
+            elif kind == "voice":
+                # The mic lives in the browser; server-side capture is desktop-only
+                await ws.send_json({"type": "error", "status": 501, "message": "Voice input is not available here."})
+    finally:
+        if state.task is not None and not state.task.done():
+            state.task.cancel()
+    return ws
+
+
+async def index(request):
+    raise web.HTTPFound("/ui/index.html")
+
+
+async def _on_startup(app):
+    memory.init_db()
+    await app["ollama"].start()
+    # Warmups fire on timer threads; hand them to the event loop's slot limiter
+    loop = asyncio.get_running_loop()
+    ollama = app["ollama"]
+    brain.WARMER.send = lambda body: asyncio.run_coroutine_threadsafe(ollama.warm(body), loop).result()
+
+
+async def _on_cleanup(app):
+    brain.WARMER.cancel()
+    brain.WARMER.send = None
+    for state in app["sessions"].values():
+        if state.task is not None and not state.task.done():
+            state.task.cancel()
+    await app["ollama"].close()
+    memory.close()
+
+
+def create_app(ollama_url=None, max_concurrency=SERVER_MAX_CONCURRENCY, max_queue=SERVER_MAX_QUEUE):
+    if ollama_url:
+        brain.use_server(ollama_url)
+    app = web.Application()
+    app["sessions"] = {}
+    app["ollama"] = AsyncOllama(max_concurrency, max_queue)
+    app.router.add_get("/", index)
+    app.router.add_get("/api/health", health)
+    app.router.add_post("/api/chat", chat)
+    app.router.add_get("/api/history", history)
+    app.router.add_delete("/api/history", clear_history)
+    app.router.add_get("/api/search", search)
+    app.router.add_get("/ws", websocket)
+    for name in ("ui", "assets"):
+        folder = os.path.join(BASE_DIR, name)
+        if os.path.isdir(folder):  # assets/ is not shipped with every checkout
+            app.router.add_static(f"/{name}", folder)
+    app.on_startup.append(_on_startup)
+    app.on_cleanup.append(_on_cleanup)
+    return app
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run Vi as a headless HTTP/WebSocket server")
+    ap.add_argument("--host", default=SERVER_HOST)
+    ap.add_argument("--port", type=int, default=SERVER_PORT)
+    ap.add_argument("--ollama", help="Ollama base URL (default: OLLAMA_BASE_URL from config)")
+    ap.add_argument("--max-concurrency", type=int, default=SERVER_MAX_CONCURRENCY)
+    ap.add_argument("--max-queue", type=int, default=SERVER_MAX_QUEUE)
+    args = ap.parse_args()
+    web.run_app(create_app(args.ollama, args.max_concurrency, args.max_queue), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,707 @@
+import concurrent.futures
+import importlib.util
+import io
+import multiprocessing
+import os
+import queue
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import wave
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from config import COQUI_MODEL_NAME, AUDIO_BACKEND, PYTTSX3_RATE, COQUI_WORKERS, COQUI_MAX_SEGMENT_SECONDS
+
+# Sentence boundary: terminal punctuation (incl. Devanagari danda) followed by
+# whitespace, or a line break.
+SENTENCE_END = re.compile(r"(?<=[.!?।…])\s+|\n+")
+
+_CLOSE = object()
+
+
+class SentenceSplitter:
+    """
+    Turns a stream of LLM chunks into complete sentences.
+    Very short fragments ("Hi!") are held back and merged with the next
+    sentence so the TTS engine is not started for a single word.
+    """
+
+    def __init__(self, min_chars=12):
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def feed(self, chunk):
+        """Add a chunk; return the list of sentences completed by it."""
+        self.buffer += chunk
+        parts = SENTENCE_END.split(self.buffer)
+        if len(parts) < 2:
+            return []
+        self.buffer = parts.pop()
+        sentences = []
+        pending = ""
+        for part in parts:
+            part = part.strip()
+            if not part:
+                continue
+            pending = f"{pending} {part}" if pending else part
+            if len(pending) >= self.min_chars:
+                sentences.append(pending)
+                pending = ""
+        if pending:
+            self.buffer = f"{pending} {self.buffer}"
+        return sentences
+
+    def flush(self):
+        """Return whatever is left once the stream is done."""
+        rest = self.buffer.strip()
+        self.buffer = ""
+        return rest
+
+
+class SpeechPipeline:
+    """
+    Two-stage speech queue: a synthesis thread turns queued sentences into
+    audio while `run()` plays the previous one, so synthesis of sentence N+1
+    overlaps playback of sentence N.
+
+    synthesize(text) -> audio   (any object understood by `play`), or a
+                                concurrent.futures.Future of it: the next
+                                sentences are then submitted without waiting,
+                                so up to `prefetch` of them synthesize in
+                                parallel, and are still played in order
+    play(audio)                 blocks until the audio finished playing
+    """
+
+    def __init__(self, synthesize, play, prefetch=2):
+        self.synthesize = synthesize
+        self.play = play
+        self._texts = queue.Queue()
+        self._audio = queue.Queue(maxsize=prefetch)
+        self._stopped = threading.Event()
+
+    @property
+    def stopped(self):
+        return self._stopped.is_set()
+
+    def put(self, text):
+        text = (text or "").strip()
+        if text and not self.stopped:
+            self._texts.put(text)
+
+    def close(self):
+        """No more sentences for this turn; `run()` returns once all are played."""
+        self._texts.put(_CLOSE)
+
+    def stop(self):
+        """Drop everything still queued; `run()` returns after the current clip."""
+        self._stopped.set()
+        for q in (self._texts, self._audio):
+            try:
+                while True:
+                    item = q.get_nowait()
+                    if isinstance(item, Future):
+                        item.cancel()
+            except queue.Empty:
+                pass
+        self._texts.put(_CLOSE)
+        try:
+            self._audio.put_nowait(_CLOSE)
+        except queue.Full:
+            pass
+
+    def _hand_over(self, item):
+        # Bounded put that gives up once the pipeline is stopped
+        while not self.stopped:
+            try:
+                self._audio.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        if isinstance(item, Future):
+            item.cancel()
+
+    def _resolve(self, future):
+        # Wait for a pending synthesis, but give up as soon as the pipeline is stopped
+        while True:
+            try:
+                return future.result(timeout=0.1)
+            except concurrent.futures.TimeoutError:
+                if self.stopped:
+                    future.cancel()
+                    return None
+            except concurrent.futures.CancelledError:
+                return None
+            except Exception as e:
+                print(f"[Speech Error] {e}")
+                return None
+
+    def _synth_loop(self):
+        while not self.stopped:
+            text = self._texts.get()
+            if text is _CLOSE:
+                self._hand_over(_CLOSE)
+                return
+            try:
+                audio = self.synthesize(text)
+            except Exception as e:
+                print(f"[Speech Error] {e}")
+                continue
+            if audio is not None:
+                self._hand_over(audio)
+
+    def run(self, on_start=None):
+        synth = threading.Thread(target=self._synth_loop, name="tts-synth", daemon=True)
+        synth.start()
+        started = False
+        while True:
+            audio = self._audio.get()
+            if audio is _CLOSE or self.stopped:
+                break
+            if isinstance(audio, Future):
+                audio = self._resolve(audio)
+                if audio is None:
+                    if self.stopped:
+                        break
+                    continue
+            if not started and on_start is not None:
+                on_start()
+            started = True
+            try:
+                self.play(audio)
+            except Exception as e:
+                print(f"[Speech Error] {e}")
+        if not self.stopped:
+            synth.join()
+        return started
+
+
+# ──────────────────────────────────────────────
+# 🔈 In-memory audio + pluggable playback
+# ──────────────────────────────────────────────
+class Audio:
+    """Mono 16-bit PCM held in memory."""
+
+    def __init__(self, pcm, rate):
+        self.pcm = pcm
+        self.rate = rate
+
+    @classmethod
+    def from_float(cls, samples, rate):
+        import numpy as np
+        arr = np.clip(np.asarray(samples, dtype=np.float32), -1.0, 1.0)
+        return cls((arr * 32767).astype("<i2").tobytes(), rate)
+
+    @classmethod
+    def from_wav(cls, data):
+        with wave.open(io.BytesIO(data), "rb") as w:
+            if w.getsampwidth() != 2 or w.getnchannels() != 1:
+                raise ValueError("expected mono 16-bit wav")
+            return cls(w.readframes(w.getnframes()), w.getframerate())
+
+    def to_wav(self):
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(self.rate)
+            w.writeframes(self.pcm)
+        return buf.getvalue()
+
+    @property
+    def duration(self):
+        return len(self.pcm) / 2 / self.rate if self.rate else 0.0
+
+
+class SoundDevicePlayer:
+    name = "sounddevice"
+
+    def __init__(self):
+        import sounddevice
+        self.sd = sounddevice
+
+    def play(self, audio):
+        import numpy as np
+        self.sd.play(np.frombuffer(audio.pcm, dtype="<i2"), audio.rate)
+        self.sd.wait()
+
+    def stop(self):
+        self.sd.stop()
+
+
+class SimpleAudioPlayer:
+    name = "simpleaudio"
+
+    def __init__(self):
+        import simpleaudio
+        self.sa = simpleaudio
+        self._current = None
+
+    def play(self, audio):
+        self._current = self.sa.play_buffer(audio.pcm, 1, 2, audio.rate)
+        self._current.wait_done()
+        self._current = None
+
+    def stop(self):
+        if self._current is not None:
+            self._current.stop()
+
+
+class WinsoundPlayer:
+    name = "winsound"
+
+    def __init__(self):
+        import winsound
+        self.ws = winsound
+
+    def play(self, audio):
+        self.ws.PlaySound(audio.to_wav(), self.ws.SND_MEMORY)
+
+    def stop(self):
+        self.ws.PlaySound(None, 0)
+
+
+class CommandPlayer:
+    """Pipes WAV bytes into a command-line player (aplay / paplay / ffplay)."""
+    COMMANDS = (
+        ["aplay", "-q", "-"],
+        ["paplay"],
+        ["ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet", "-"],
+    )
+
+    def __init__(self):
+        for cmd in self.COMMANDS:
+            if shutil.which(cmd[0]):
+                self.cmd = cmd
+                self.name = cmd[0]
+                break
+        else:
+            raise RuntimeError("no command-line audio player found")
+        self._proc = None
+
+    def play(self, audio):
+        self._proc = subprocess.Popen(self.cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            self._proc.communicate(audio.to_wav())
+        except (BrokenPipeError, OSError):
+            pass
+        self._proc = None
+
+    def stop(self):
+        proc = self._proc
+        if proc is not None:
+            proc.terminate()
+
+
+PLAYERS = {
+    "sounddevice": SoundDevicePlayer,
+    "simpleaudio": SimpleAudioPlayer,
+    "winsound": WinsoundPlayer,
+    "command": CommandPlayer,
+}
+_AUTO_ORDER = ("winsound", "sounddevice", "simpleaudio", "command") if sys.platform == "win32" \
+    else ("sounddevice", "simpleaudio", "command")
+
+_player = None
+
+
+def get_player(name=None):
+    """Return the shared playback backend (AUDIO_BACKEND in config, or the first that works)."""
+    global _player
+    if _player is not None:
+        return _player
+    name = name or AUDIO_BACKEND
+    order = _AUTO_ORDER if name == "auto" else (name,)
+    for candidate in order:
+        try:
+            _player = PLAYERS[candidate]()
+            return _player
+        except Exception:
+            continue
+    raise RuntimeError(f"No audio playback backend available (tried {', '.join(order)})")
+
+
+# ──────────────────────────────────────────────
+# 🗣 Coqui TTS (loaded once, in the background)
+# ──────────────────────────────────────────────
+def coqui_available():
+    return importlib.util.find_spec("TTS") is not None
+
+
+class CoquiVoice:
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.model = None
+        self.error = None
+        self._ready = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+        self._synth_lock = threading.Lock()  # live turns and idle prefill share one model
+
+    def _load(self):
+        try:
+            from TTS.api import TTS
+            self.model = TTS(model_name=self.model_name, progress_bar=False, gpu=False)
+        except Exception as e:
+            self.error = e
+            print(f"[Coqui Error] {e}")
+        finally:
+            self._ready.set()
+
+    def load_async(self):
+        """Start loading the model on a background thread (idempotent)."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._load, name="coqui-load", daemon=True).start()
+
+    def wait(self, timeout=None):
+        self.load_async()
+        self._ready.wait(timeout)
+        return self.model
+
+    @property
+    def sample_rate(self):
+        try:
+            return self.model.synthesizer.output_sample_rate
+        except Exception:
+            return 22050
+
+    def synthesize(self, text):
+        model = self.wait()
+        if model is None:
+            raise RuntimeError(f"Coqui model unavailable: {self.error}")
+        with self._synth_lock:
+            samples = model.tts(text=text)
+        return Audio.from_float(samples, self.sample_rate)
+
+
+COQUI = CoquiVoice(COQUI_MODEL_NAME)
+
+
+# ──────────────────────────────────────────────
+# 🏭 Coqui in worker processes (PyTorch off the GUI interpreter)
+# ──────────────────────────────────────────────
+_pool_model = None  # set in each worker process by _pool_init
+
+
+def _pool_init(model_name):
+    global _pool_model
+    try:
+        from TTS.api import TTS
+        _pool_model = TTS(model_name=model_name, progress_bar=False, gpu=False)
+    except Exception as e:
+        print(f"[Coqui Error] {e}")
+
+
+def _pool_ping():
+    return _pool_model is not None
+
+
+def _pool_synthesize(text, slot_name, slot_size):
+    """Worker side: synthesize into the parent's shared-memory slot, return (bytes written, rate)."""
+    if _pool_model is None:
+        raise RuntimeError("Coqui model unavailable in worker")
+    try:
+        rate = _pool_model.synthesizer.output_sample_rate
+    except Exception:
+        rate = 22050
+    pcm = Audio.from_float(_pool_model.tts(text=text), rate).pcm
+    if len(pcm) > slot_size:
+        return pcm, rate  # longer than a slot: sent back pickled instead
+    shm = shared_memory.SharedMemory(name=slot_name)
+    try:
+        shm.buf[:len(pcm)] = pcm
+    finally:
+        shm.close()
+    return len(pcm), rate
+
+
+class CoquiPool:
+    """
+    Coqui synthesis in a pool of worker processes, so model inference never
+    holds the GIL of the process running the Qt event loop and the LLM stream.
+    - every worker loads the model once (pool initializer)
+    - submit(text) returns a Future of Audio; segments of one answer are
+      synthesized in parallel and SpeechPipeline plays them in order
+    - PCM comes back through shared-memory slots owned by this process
+      (2 per worker, sized for COQUI_MAX_SEGMENT_SECONDS), not pickled
+    Same load_async()/synthesize() interface as CoquiVoice.
+    """
+
+    def __init__(self, model_name, workers=COQUI_WORKERS, slot_bytes=COQUI_MAX_SEGMENT_SECONDS * 24000 * 2):
+        self.model_name = model_name
+        self.workers = max(1, workers)
+        self.slot_bytes = slot_bytes
+        self._executor = None
+        self._slots = queue.Queue()
+        self._all_slots = []
+        self._lock = threading.Lock()
+
+    def _ensure(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn, never fork: the parent runs Qt and HTTP threads
+                self._executor = ProcessPoolExecutor(
+                    self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_pool_init,
+                    initargs=(self.model_name,),
+                )
+                for _ in range(self.workers * 2):
+                    slot = shared_memory.SharedMemory(create=True, size=self.slot_bytes)
+                    self._all_slots.append(slot)
+                    self._slots.put(slot)
+            return self._executor
+
+    def load_async(self):
+        """Start the workers now; each loads the model in the background."""
+        executor = self._ensure()
+        for _ in range(self.workers):
+            executor.submit(_pool_ping)
+
+    def submit(self, text):
+        """Future of Audio for `text`. Blocks only while every slot is in flight."""
+        executor = self._ensure()
+        slot = self._slots.get()
+        try:
+            inner = executor.submit(_pool_synthesize, text, slot.name, slot.size)
+        except Exception:
+            self._slots.put(slot)
+            raise
+        out = Future()
+
+        def _done(f):
+            result = error = None
+            try:
+                if not f.cancelled():
+                    error = f.exception()
+                    if error is None:
+                        data, rate = f.result()
+                        pcm = data if isinstance(data, bytes) else bytes(slot.buf[:data])
+                        result = Audio(pcm, rate)
+            except Exception as e:
+                error = e
+            finally:
+                self._slots.put(slot)
+            if f.cancelled():
+                out.cancel()
+            elif out.set_running_or_notify_cancel():
+                if error is not None:
+                    out.set_exception(error)
+                else:
+                    out.set_result(result)
+
+        inner.add_done_callback(_done)
+        out.add_done_callback(lambda o: inner.cancel() if o.cancelled() else None)
+        return out
+
+    def synthesize(self, text):
+        return self.submit(text).result()
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            slots, self._all_slots = self._all_slots, []
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        for slot in slots:
+            try:
+                slot.close()
+                slot.unlink()
+            except Exception:
+                pass
+
+
+COQUI_POOL = CoquiPool(COQUI_MODEL_NAME)
+
+
+# ──────────────────────────────────────────────
+# 🗣 pyttsx3 fallback voice (one engine for the whole session)
+# ──────────────────────────────────────────────
+class _Job:
+    def __init__(self, kind, text, generation, on_start=None, on_done=None):
+        self.kind = kind            # "say" | "render"
+        self.text = text
+        self.generation = generation
+        self.on_start = on_start
+        self.on_done = on_done
+        self.result = None
+        self.completed = False
+        self.done = threading.Event()
+
+
+class Pyttsx3Service:
+    """
+    Owns the pyttsx3 engine on one long-lived thread.
+    - the engine is created and the voice resolved once, not per reply
+    - say()/render() queue jobs; interrupt() drops everything queued and
+      cuts the utterance that is playing
+    - on_start(text) / on_done(text, completed) report each utterance back
+    """
+
+    PREFERRED = ("zira", "female", "woman")
+
+    def __init__(self, rate=PYTTSX3_RATE, volume=1.0):
+        self.rate = rate
+        self.volume = volume
+        self.voice_id = None
+        self.error = None
+        self.can_render = True     # False once save_to_file gave audio we cannot play
+        self._jobs = queue.Queue()
+        self._engine = None
+        self._generation = 0
+        self._speaking = None      # generation of the utterance in runAndWait(), service thread only
+        self._ready = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the engine thread (idempotent); the engine initializes in the background."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="pyttsx3", daemon=True)
+                self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        self.start()
+        self._ready.wait(timeout)
+        return self._engine is not None
+
+    def _init_engine(self):
+        import pyttsx3
+        engine = pyttsx3.init()
+        engine.setProperty("rate", self.rate)
+        engine.setProperty("volume", self.volume)
+        voices = engine.getProperty("voices") or []
+        preferred = None
+        for v in voices:
+            name = (v.name or "").lower()
+            vid = (v.id or "").lower()
+            if any(p in name for p in self.PREFERRED) or "zira" in vid:
+                preferred = v.id
+                break
+        if preferred is None and voices:
+            preferred = voices[0].id
+        if preferred:
+            engine.setProperty("voice", preferred)
+        self.voice_id = engine.getProperty("voice")
+        # Fired on this thread inside runAndWait(): the only safe place to stop the engine
+        engine.connect("started-word", self._on_word)
+        return engine
+
+    def _on_word(self, name=None, location=None, length=None):
+        if self._speaking is not None and self._speaking != self._generation:
+            self._speaking = None
+            self._engine.stop()
+
+    def _run(self):
+        try:
+            self._engine = self._init_engine()
+        except Exception as e:
+            self.error = e
+            print(f"[Speech Error] pyttsx3: {e}")
+        finally:
+            self._ready.set()
+        while True:
+            job = self._jobs.get()
+            if job is _CLOSE:
+                return
+            if self._engine is None or job.generation != self._generation:
+                self._finish(job)
+                continue
+            try:
+                if job.kind == "render":
+                    job.result = self._render(job.text)
+                else:
+                    if job.on_start is not None:
+                        job.on_start(job.text)
+                    self._speaking = job.generation
+                    self._engine.say(job.text)
+                    try:
+                        self._engine.runAndWait()
+                    finally:
+                        self._speaking = None
+                job.completed = job.generation == self._generation
+            except Exception as e:
+                print(f"[Speech Error] {e}")
+            self._finish(job)
+
+    @staticmethod
+    def _finish(job):
+        job.done.set()
+        if job.on_done is not None:
+            try:
+                job.on_done(job.text, job.completed)
+            except Exception as e:
+                print(f"[Speech Error] {e}")
+
+    def _render(self, text):
+        if not self.can_render:
+            return None
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            self._engine.save_to_file(text, path)
+            self._engine.runAndWait()
+            with open(path, "rb") as f:
+                return Audio.from_wav(f.read())
+        except Exception as e:
+            print(f"[Speech Error] pyttsx3 render: {e}")
+            self.can_render = False
+            return None
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _submit(self, kind, text, on_start=None, on_done=None):
+        self.start()
+        job = _Job(kind, text, self._generation, on_start, on_done)
+        self._jobs.put(job)
+        return job
+
+    def say(self, text, on_start=None, on_done=None, wait=True):
+        """Speak `text`; with wait=True blocks until it finished. True if it played to the end."""
+        job = self._submit("say", text, on_start, on_done)
+        if not wait:
+            return job
+        job.done.wait()
+        return job.completed
+
+    def render(self, text):
+        """Audio of `text` via save_to_file, or None when the driver's output is unusable."""
+        job = self._submit("render", text)
+        job.done.wait()
+        return job.result
+
+    def interrupt(self):
+        """
+        Drop every queued job and stop the current utterance. The engine is
+        not thread-safe, so only the generation changes here; the engine
+        thread stops itself at the next word boundary (see _on_word).
+        """
+        self._generation += 1
+        try:
+            while True:
+                job = self._jobs.get_nowait()
+                if job is _CLOSE:
+                    self._jobs.put(_CLOSE)
+                    break
+                self._finish(job)
+        except queue.Empty:
+            pass
+
+    def close(self):
+        self.interrupt()
+        if self._thread is not None:
+            self._jobs.put(_CLOSE)
+
+
+PYTTSX3 = Pyttsx3Service()
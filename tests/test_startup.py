@@ -0,0 +1,41 @@
+"""
+Cold-start regression test: `python main.py --startup-check` under offscreen
+Qt must reach first paint within STARTUP_BUDGET_MS (the app exits 1 otherwise).
+
+    python -m unittest discover -s tests      (or: python -m pytest tests)
+"""
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TIMEOUT = 60  # seconds before a hung window counts as a failure
+
+
+def _qt_available():
+    # A real import: the wheels can be installed while Qt's system libraries are missing
+    try:
+        import PyQt6.QtWebEngineWidgets  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+@unittest.skipUnless(_qt_available(), "PyQt6 / PyQt6-WebEngine not installed")
+class StartupBudgetTest(unittest.TestCase):
+    def test_first_paint_within_budget(self):
+        env = dict(os.environ)
+        env.setdefault("QT_QPA_PLATFORM", "offscreen")
+        # Chromium refuses its sandbox as root (CI containers)
+        env.setdefault("QTWEBENGINE_CHROMIUM_FLAGS", "--no-sandbox")
+        proc = subprocess.run(
+            [sys.executable, os.path.join(ROOT, "main.py"), "--startup-check"],
+            cwd=ROOT, env=env, capture_output=True, text=True, timeout=TIMEOUT,
+        )
+        self.assertEqual(proc.returncode, 0, f"startup check failed:\n{proc.stdout}\n{proc.stderr}")
+        self.assertIn("[Startup]", proc.stdout)
+
+
+if __name__ == "__main__":
+    unittest.main()
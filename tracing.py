@@ -0,0 +1,160 @@
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from config import TRACING_ENABLED, TRACE_PATH
+
+_write_lock = threading.Lock()
+
+
+def percentile(values, q):
+    """q in [0, 100], linear interpolation; None for no data."""
+    if not values:
+        return None
+    data = sorted(values)
+    k = (len(data) - 1) * q / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(data) - 1)
+    return data[lo] + (data[hi] - data[lo]) * (k - lo)
+
+
+class Trace:
+    """
+    Per-turn latency record. Spans can be added from any thread; finish()
+    appends the whole turn as one JSON line to TRACE_PATH.
+    Span times are milliseconds relative to the start of the trace.
+    """
+
+    def __init__(self, kind="turn", t0=None, **attrs):
+        """t0: perf_counter() value the trace starts at, when that was before it was created."""
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        now = time.perf_counter()
+        self.t0 = now if t0 is None else t0
+        self.started_at = (datetime.now() - timedelta(seconds=now - self.t0)).isoformat(timespec="milliseconds")
+        self.attrs = dict(attrs)
+        self.spans = []
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def _ms(self, t):
+        return round((t - self.t0) * 1000.0, 3)
+
+    def add_span(self, name, start, end=None, **attrs):
+        """Record a span from perf_counter() timestamps."""
+        end = time.perf_counter() if end is None else end
+        span = {"name": name, "start_ms": self._ms(start), "duration_ms": round((end - start) * 1000.0, 3)}
+        if attrs:
+            span.update(attrs)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    @contextmanager
+    def span(self, name, **attrs):
+        start = time.perf_counter()
+        extra = dict(attrs)
+        try:
+            yield extra
+        finally:
+            self.add_span(name, start, **extra)
+
+    def set(self, **attrs):
+        with self._lock:
+            self.attrs.update(attrs)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "trace_id": self.id,
+                "kind": self.kind,
+                "started_at": self.started_at,
+                "duration_ms": self._ms(time.perf_counter()),
+                "attrs": dict(self.attrs),
+                "spans": list(self.spans),
+            }
+
+    def finish(self, path=None):
+        """Write the trace once; later calls are ignored."""
+        with self._lock:
+            if self.finished:
+                return
+            self.finished = True
+        if not TRACING_ENABLED:
+            return
+        record = self.to_dict()
+        try:
+            line = json.dumps(record, ensure_ascii=False, default=str)
+            with _write_lock, open(path or TRACE_PATH, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except Exception as e:
+            print(f"[Trace Error] {e}")
+
+
+@contextmanager
+def maybe_span(trace, name, **attrs):
+    """trace.span() that is a no-op when trace is None."""
+    if trace is None:
+        yield dict(attrs)
+    else:
+        with trace.span(name, **attrs) as extra:
+            yield extra
+
+
+def load_traces(path=None):
+    path = path or TRACE_PATH
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def summarize(path=None, kind=None):
+    """{stage: {n, p50, p90, p99, max}} over span durations (ms), plus 'turn.total'."""
+    stages = {}
+    for record in load_traces(path):
+        if kind and record.get("kind") != kind:
+            continue
+        stages.setdefault(f"{record.get('kind', 'turn')}.total", []).append(record.get("duration_ms", 0.0))
+        for span in record.get("spans", []):
+            stages.setdefault(span["name"], []).append(span.get("duration_ms", 0.0))
+    return {
+        name: {
+            "n": len(vals),
+            "p50": percentile(vals, 50),
+            "p90": percentile(vals, 90),
+            "p99": percentile(vals, 99),
+            "max": max(vals),
+        }
+        for name, vals in stages.items()
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Per-stage latency percentiles from the trace log")
+    ap.add_argument("path", nargs="?", default=TRACE_PATH)
+    ap.add_argument("--kind", help="only traces of this kind (e.g. turn)")
+    args = ap.parse_args()
+    summary = summarize(args.path, args.kind)
+    if not summary:
+        print(f"No traces in {args.path}")
+        return
+    print(f"{'stage':<24} {'n':>6} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    for name, s in sorted(summary.items(), key=lambda kv: -kv[1]["p50"]):
+        print(f"{name:<24} {s['n']:>6} {s['p50']:>10.1f} {s['p90']:>10.1f} {s['p99']:>10.1f} {s['max']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from config import TTS_CACHE_DIR, TTS_CACHE_MAX_MB, TTS_CACHE_HOT_ITEMS
+from speech import Audio, SentenceSplitter
+
+
+def cache_key(text, voice, rate):
+    """Content address of one spoken phrase; whitespace differences do not matter."""
+    text = " ".join((text or "").split())
+    return hashlib.sha1(f"{voice}\0{rate}\0{text}".encode("utf-8")).hexdigest()
+
+
+def split_like_pipeline(text):
+    """The sentences SpeakWorker would receive for `text`, so prefilled keys match real ones."""
+    splitter = SentenceSplitter()
+    sentences = splitter.feed(text)
+    rest = splitter.flush()
+    return sentences + [rest] if rest else sentences
+
+
+class AudioCache:
+    """
+    Synthesized speech keyed by (text, voice, rate).
+    - hot tier: the last `hot_items` clips as Audio objects in memory
+    - disk tier: one WAV per key in `path`; least recently used files are
+      deleted once the directory grows past `max_bytes`. Recency survives
+      restarts through the files' mtime.
+    """
+
+    def __init__(self, path=TTS_CACHE_DIR, max_bytes=TTS_CACHE_MAX_MB * 1024 * 1024, hot_items=TTS_CACHE_HOT_ITEMS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hot_items = hot_items
+        self.stats = {"hot_hits": 0, "disk_hits": 0, "misses": 0}
+        self._hot = OrderedDict()
+        self._index = None        # key -> file size, least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _file(self, key):
+        return os.path.join(self.path, f"{key}.wav")
+
+    def _load_index(self):
+        # Caller holds the lock
+        if self._index is not None:
+            return
+        self._index = OrderedDict()
+        entries = []
+        try:
+            for entry in os.scandir(self.path):
+                if entry.name.endswith(".wav"):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, entry.name[:-4], st.st_size))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"[TTS Cache Error] {e}")
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._bytes += size
+
+    def _remember_hot(self, key, audio):
+        # Caller holds the lock
+        if self.hot_items <= 0:
+            return
+        self._hot[key] = audio
+        self._hot.move_to_end(key)
+        while len(self._hot) > self.hot_items:
+            self._hot.popitem(last=False)
+
+    def get(self, text, voice, rate):
+        """Cached Audio for the phrase, or None."""
+        key = cache_key(text, voice, rate)
+        with self._lock:
+            self._load_index()
+            audio = self._hot.get(key)
+            if audio is not None:
+                self._hot.move_to_end(key)
+            on_disk = key in self._index
+            if on_disk:
+                self._index.move_to_end(key)
+        if audio is not None:
+            self.stats["hot_hits"] += 1
+            return audio
+        if not on_disk:
+            self.stats["misses"] += 1
+            return None
+        try:
+            with open(self._file(key), "rb") as f:
+                audio = Audio.from_wav(f.read())
+            os.utime(self._file(key))
+        except Exception as e:
+            print(f"[TTS Cache Error] {e}")
+            self._drop(key)
+            self.stats["misses"] += 1
+            return None
+        with self._lock:
+            self._remember_hot(key, audio)
+        self.stats["disk_hits"] += 1
+        return audio
+
+    def put(self, text, voice, rate, audio):
+        """Store a clip in both tiers; evicts least recently used files over the size limit."""
+        if not isinstance(audio, Audio) or not (text or "").strip():
+            return
+        key = cache_key(text, voice, rate)
+        data = audio.to_wav()
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            # Write then rename, so a crash never leaves a truncated clip behind
+            fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.path)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self._file(key))
+        except OSError as e:
+            print(f"[TTS Cache Error] {e}")
+            with self._lock:
+                self._remember_hot(key, audio)
+            return
+        evict = []
+        with self._lock:
+            self._load_index()
+            self._remember_hot(key, audio)
+            self._bytes += len(data) - self._index.pop(key, 0)
+            self._index[key] = len(data)
+            while self._bytes > self.max_bytes and len(self._index) > 1:
+                old, size = self._index.popitem(last=False)
+                self._bytes -= size
+                self._hot.pop(old, None)
+                evict.append(old)
+        for old in evict:
+            try:
+                os.remove(self._file(old))
+            except OSError:
+                pass
+
+    def _drop(self, key):
+        with self._lock:
+            self._hot.pop(key, None)
+            if self._index is not None and key in self._index:
+                self._bytes -= self._index.pop(key)
+        try:
+            os.remove(self._file(key))
+        except OSError:
+            pass
+
+    def cached(self, text, voice, rate, synthesize):
+        """get() or synthesize(text) + put()."""
+        audio = self.get(text, voice, rate)
+        if audio is None:
+            audio = synthesize(text)
+            self.put(text, voice, rate, audio)
+        return audio
+
+    # ── idle pre-synthesis ──
+    def prefill(self, phrases, synthesize, voice, rate, is_busy=None):
+        """
+        Synthesize every sentence of `phrases` that is not cached yet.
+        Waits while is_busy() is true so it never competes with a live turn.
+        Returns the number of clips added.
+        """
+        added = 0
+        for phrase in phrases:
+            for sentence in split_like_pipeline(phrase):
+                while is_busy is not None and is_busy():
+                    time.sleep(0.5)
+                key = cache_key(sentence, voice, rate)
+                with self._lock:
+                    self._load_index()
+                    if key in self._index:
+                        continue
+                try:
+                    audio = synthesize(sentence)
+                except Exception as e:
+                    print(f"[TTS Cache Error] {e}")
+                    return added
+                if audio is None:
+                    return added  # the voice cannot produce clips (e.g. pyttsx3 without WAV output)
+                self.put(sentence, voice, rate, audio)
+                added += 1
+        return added
+
+    def prefill_async(self, phrases, synthesize, voice, rate, is_busy=None):
+        thread = threading.Thread(
+            target=self.prefill,
+            args=(list(phrases), synthesize, voice, rate, is_busy),
+            name="tts-prefill",
+            daemon=True,
+        )
+        thread.start()
+        return thread
+
+
+TTS_CACHE = AudioCache()
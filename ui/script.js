@@ -1,10 +1,65 @@
 // Initialize Qt Bridge
 let backend;
-if (typeof QWebChannel !== 'undefined') {
+if (typeof QWebChannel !== 'undefined' && typeof qt !== 'undefined') {
     new QWebChannel(qt.webChannelTransport, function (channel) {
         backend = channel.objects.backend;
         console.log("Qt Bridge Connected");
     });
+} else if (location.protocol.startsWith('http')) {
+    backend = createSocketBackend();
+}
+
+// 🌐 Browser mode (python server.py): same backend API over a WebSocket
+function createSocketBackend() {
+    let sessionId = localStorage.getItem('vi-session') || '';
+    let socket = null;
+    let outbox = [];
+
+    function connect() {
+        const proto = location.protocol === 'https:' ? 'wss:' : 'ws:';
+        const query = sessionId ? `?session=${encodeURIComponent(sessionId)}` : '';
+        socket = new WebSocket(`${proto}//${location.host}/ws${query}`);
+        socket.onopen = () => {
+            outbox.forEach((m) => socket.send(m));
+            outbox = [];
+        };
+        socket.onmessage = (ev) => {
+            const msg = JSON.parse(ev.data);
+            if (msg.type === 'session') {
+                sessionId = msg.session;
+                localStorage.setItem('vi-session', sessionId);
+            } else if (msg.type === 'emotion') {
+                updateEmotion(msg.emotion);
+            } else if (msg.type === 'delta') {
+                appendResponse(msg.text);
+            } else if (msg.type === 'done') {
+                if (streamingResponse) endResponse();
+                else updateResponse(msg.response);
+                stopListening();
+            } else if (msg.type === 'error') {
+                updateResponse(msg.message || 'Error');
+                stopListening();
+            }
+        };
+        socket.onclose = () => { setTimeout(connect, 1000); };
+    }
+
+    function send(payload) {
+        const data = JSON.stringify(payload);
+        if (socket && socket.readyState === WebSocket.OPEN) socket.send(data);
+        else outbox.push(data);
+    }
+
+    connect();
+    console.log("WebSocket backend");
+    return {
+        process_text: (text) => {
+            endResponse();
+            send({ type: 'message', text });
+        },
+        start_voice_input: () => send({ type: 'voice' }),
+        typing: (text) => send({ type: 'typing', text }),
+    };
 }
 
 const inputField = document.getElementById('user-input');
@@ -20,14 +75,62 @@ let lastIdleGif = null;
 let idleLoopTimer = null;
 const IDLE_GIF_INTERVAL = 10000; // ms; rotate start/idle gifs
 
-// If the default Start.gif is missing, fallback to a valid one from Start folder
-function ensureStartOnError() {
-    if (!charImg) return;
-    charImg.onerror = () => {
-        pickStartGif((src) => { charImg.src = src; });
-    };
+// 🖼 Character GIFs: Python pushes a manifest of assets/ (setAssetManifest); nothing is probed
+const DEFAULT_ASSETS = {
+    Start: [{ src: "../assets/Start/Start.gif" }],
+    AnsEx: [{ src: "../assets/AnsEx/Explain1.gif" }],
+    Happy: [1, 2, 3, 4, 5, 6].map((i) => ({ src: `../assets/Happy/HAPPY${i}.gif` })),
+    Sad: [1, 2, 3, 4].map((i) => ({ src: `../assets/Sad/SAD${i}.gif` })),
+};
+// emotion -> assets/ folder (and a fixed file where one emotion always uses the same GIF)
+const EMOTION_GIFS = {
+    question: { folder: "AnsEx" }, ask: { folder: "AnsEx" }, explain: { folder: "AnsEx" },
+    happy: { folder: "Happy" }, joy: { folder: "Happy" },
+    sad: { folder: "Sad" },
+    alone: { folder: "Sad", src: "../assets/Sad/SAD4.gif" }, lonely: { folder: "Sad", src: "../assets/Sad/SAD4.gif" },
+    love: { folder: "Happy", src: "../assets/Happy/HAPPY1.gif" }, heart: { folder: "Happy", src: "../assets/Happy/HAPPY1.gif" },
+};
+const LIKELY_FOLDERS = ["Start", "Happy", "AnsEx", "Sad"]; // preloaded so the next switch is instant
+const IMAGE_CACHE_MAX_ITEMS = 12;
+const IMAGE_CACHE_MAX_BYTES = 32 * 1024 * 1024; // by file size from the manifest
+
+let assets = DEFAULT_ASSETS;
+const assetInfo = new Map();   // src -> manifest entry
+const failedAssets = new Set();
+const nextPick = {};           // folder -> src already decoded for the next switch
+
+// Bounded LRU of decoded images (Map keeps insertion order: oldest first)
+const imageCache = new Map();  // src -> { img, ready: Promise<boolean>, bytes }
+let imageCacheBytes = 0;
+
+function preloadImage(src) {
+    let entry = imageCache.get(src);
+    if (entry) {
+        imageCache.delete(src); // move to the most recently used end
+        imageCache.set(src, entry);
+        return entry.ready;
+    }
+    const img = new Image();
+    img.src = src;
+    const ready = img.decode().then(() => true, () => {
+        failedAssets.add(src);
+        if (imageCache.get(src) === entry) {
+            imageCache.delete(src);
+            imageCacheBytes -= entry.bytes;
+        }
+        return false;
+    });
+    entry = { img, ready, bytes: (assetInfo.get(src) || {}).bytes || 0 };
+    imageCache.set(src, entry);
+    imageCacheBytes += entry.bytes;
+    for (const [old, e] of imageCache) {
+        if (imageCache.size <= IMAGE_CACHE_MAX_ITEMS && imageCacheBytes <= IMAGE_CACHE_MAX_BYTES) break;
+        if (old === src || old === charImg.getAttribute('src')) continue;
+        imageCache.delete(old);
+        imageCacheBytes -= e.bytes;
+    }
+    return ready;
 }
-ensureStartOnError();
 
 function shuffle(arr) {
     for (let i = arr.length - 1; i > 0; i--) {
@@ -37,55 +140,54 @@ function shuffle(arr) {
     return arr;
 }
 
-function startGifCandidates() {
-    const base = "../assets/Start/";
-    const idleActCaps = Array.from({ length: 12 }, (_, i) => `${base}IDLEACT${i + 1}.gif`);
-    const idleActCamel = Array.from({ length: 12 }, (_, i) => `${base}IdleAct${i + 1}.gif`);
-    const idleCaps = Array.from({ length: 12 }, (_, i) => `${base}IDLE${i + 1}.gif`);
-    const idleCamel = Array.from({ length: 12 }, (_, i) => `${base}Idle${i + 1}.gif`);
-    const caps = Array.from({ length: 12 }, (_, i) => `${base}START${i + 1}.gif`);
-    const camel = Array.from({ length: 12 }, (_, i) => `${base}Start${i + 1}.gif`);
-    return shuffle([
-        ...idleActCaps,
-        ...idleActCamel,
-        ...idleCaps,
-        ...idleCamel,
-        ...caps,
-        ...camel,
-        `${base}start.gif`,
-        `${base}Start.gif`,
-        `${base}START.gif`,
-        `${base}idle.gif`,
-        `${base}Idle.gif`,
-        `${base}IDLE.gif`,
-        `${base}IdleAct.gif`,
-        `${base}IDLEACT.gif`
-    ]);
+function folderGifs(folder) {
+    return (assets[folder] || []).map((a) => a.src).filter((src) => !failedAssets.has(src));
 }
 
-function pickStartGif(cb) {
-    let list = [];
-    if (Array.isArray(window.START_GIFS) && window.START_GIFS.length) {
-        list = shuffle(window.START_GIFS.slice());
-    } else {
-        list = startGifCandidates();
-    }
-    if (lastIdleGif) {
-        list = list.filter((p) => p !== lastIdleGif);
-        if (list.length === 0) list = startGifCandidates();
-    }
-    function tryNext(idx) {
-        if (idx >= list.length) {
-            cb("../assets/AnsEx/Explain1.gif");
-            return;
+// Random GIF of a folder (not `avoid`), decoded ahead of time when possible
+function pickGif(folder, avoid) {
+    const pre = nextPick[folder];
+    if (pre && pre !== avoid && !failedAssets.has(pre)) return pre;
+    const list = shuffle(folderGifs(folder)).filter((src) => src !== avoid);
+    return list[0] || folderGifs(folder)[0] || null;
+}
+
+function prepareNext(folder, avoid) {
+    const src = pickGif(folder, avoid);
+    nextPick[folder] = src;
+    if (src) preloadImage(src);
+}
+
+function setAssetManifest(manifest) {
+    if (!manifest || typeof manifest !== 'object' || !Object.keys(manifest).length) return;
+    assets = manifest;
+    assetInfo.clear();
+    Object.values(manifest).forEach((items) => items.forEach((a) => assetInfo.set(a.src, a)));
+    LIKELY_FOLDERS.forEach((folder) => prepareNext(folder));
+}
+
+// Show `src` once it is decoded (instant when it came from the cache).
+// A later call wins if an older image is still decoding; onShown runs either way.
+let showSeq = 0;
+function showGif(src, onShown) {
+    if (!src) return;
+    const seq = ++showSeq;
+    preloadImage(src).then((ok) => {
+        if (ok && seq === showSeq) {
+            charImg.addEventListener('load', () => { syncOutputBubble(); }, { once: true });
+            charImg.src = src;
         }
-        const src = list[idx];
-        const img = new Image();
-        img.onload = () => { lastIdleGif = src; cb(src); };
-        img.onerror = () => tryNext(idx + 1);
-        img.src = src;
-    }
-    tryNext(0);
+        if (typeof onShown === 'function') onShown();
+    });
+}
+
+// If the current GIF is missing, switch to another known one from the manifest
+if (charImg) {
+    charImg.onerror = () => {
+        failedAssets.add(charImg.getAttribute('src'));
+        const src = pickGif("Start");
+        if (src && src !== charImg.getAttribute('src')) charImg.src = src;
+    };
 }
 
 let revealOnce = false;
@@ -102,16 +204,15 @@ if (charImg.complete) {
 }
 
 function setStartGifOnce(onAfterSet) {
-    pickStartGif((src) => {
-        const nextImg = new Image();
-        nextImg.onload = () => {
-            charImg.onerror = () => { pickStartGif((s)=> { charImg.src = s; }); };
-            const syncAfterLoad = () => { syncOutputBubble(); };
-            charImg.addEventListener('load', syncAfterLoad, { once: true });
-            charImg.src = src;
-            if (typeof onAfterSet === 'function') onAfterSet();
-        };
-        nextImg.src = src;
+    const src = pickGif("Start", lastIdleGif);
+    if (!src) {
+        if (typeof onAfterSet === 'function') onAfterSet();
+        return;
+    }
+    showGif(src, () => {
+        lastIdleGif = src;
+        prepareNext("Start", src);
+        if (typeof onAfterSet === 'function') onAfterSet();
     });
 }
 
@@ -162,6 +263,7 @@ function sendMessage() {
     const text = inputField.value.trim();
     if (!text) return;
     inputField.value = '';
+    clearTimeout(typingTimer);
     responseText.innerText = "...";
     if (backend) {
         backend.process_text(text);
@@ -172,6 +274,17 @@ inputField.addEventListener('keypress', (e) => {
     if (e.key === 'Enter') sendMessage();
 });
 
+// ⌨️ Typing activity lets Python warm the model before Enter is pressed
+const TYPING_DEBOUNCE_MS = 250;
+let typingTimer = null;
+inputField.addEventListener('input', () => {
+    clearTimeout(typingTimer);
+    typingTimer = setTimeout(() => {
+        const text = inputField.value.trim();
+        if (backend && backend.typing && text) backend.typing(text);
+    }, TYPING_DEBOUNCE_MS);
+});
+
 sendBtn.addEventListener('click', sendMessage);
 
 // 🎤 Mic Action
@@ -183,53 +296,47 @@ micBtn.addEventListener('click', () => {
 });
 
 // 🧠 Update UI from Python
+let streamingResponse = false;
+
 function updateResponse(text) {
+    streamingResponse = false;
     responseText.innerText = text;
 }
 
+// Streaming: Python sends only the new text, batched once per frame
+function appendResponse(delta) {
+    if (!streamingResponse) {
+        responseText.textContent = '';
+        streamingResponse = true;
+    }
+    responseText.appendChild(document.createTextNode(delta));
+    responseText.scrollTop = responseText.scrollHeight;
+}
+
+function endResponse() {
+    streamingResponse = false;
+    responseText.normalize(); // merge the per-frame text nodes
+}
+
 function updateEmotion(emotion) {
     if (!emotion) return;
     const e = String(emotion).toLowerCase();
     if (e === currentEmotion) return; // avoid redundant reloads
     currentEmotion = e;
 
-    // Emotion-specific mapping
-    let gifPath = "../assets/Start/Start.gif"; // default/idle
-    if (e === "idle" || e === "talk" || e === "smile" || e === "answer") {
-        startIdleLoop(true);
-        return;
-    } else if (e === "question" || e === "ask" || e === "explain") {
-        stopIdleLoop();
-        gifPath = "../assets/AnsEx/Explain1.gif";
-    } else if (e === "happy" || e === "joy") {
-        stopIdleLoop();
-        const rand = Math.floor(Math.random() * 6) + 1; // HAPPY1..6
-        gifPath = `../assets/Happy/HAPPY${rand}.gif`;
-    } else if (e === "sad") {
-        stopIdleLoop();
-        const rand = Math.floor(Math.random() * 4) + 1; // SAD1..4
-        gifPath = `../assets/Sad/SAD${rand}.gif`;
-    } else if (e.includes("alone") || e.includes("lonely")) {
-        stopIdleLoop();
-        gifPath = "../assets/Sad/SAD4.gif";
-    } else if (e === "love" || e === "heart") {
-        stopIdleLoop();
-        gifPath = "../assets/Happy/HAPPY1.gif";
-    } else {
-        // Fallback: default to idle loop
+    const mapped = EMOTION_GIFS[e] || (e.includes("alone") || e.includes("lonely") ? EMOTION_GIFS.lonely : null);
+    if (!mapped) {
+        // idle / talk / smile / answer and anything unknown: idle loop
         startIdleLoop(true);
         return;
     }
-
-    // Preload image to avoid visible re-render hitch
-    const nextImg = new Image();
-    nextImg.onload = () => {
-        charImg.onerror = () => { pickStartGif((s)=> { charImg.src = s; }); };
-        const syncAfterLoad = () => { syncOutputBubble(); };
-        charImg.addEventListener('load', syncAfterLoad, { once: true });
-        charImg.src = gifPath;
-    };
-    nextImg.src = gifPath;
+    stopIdleLoop();
+    const current = charImg.getAttribute('src');
+    const gifPath = mapped.src && !failedAssets.has(mapped.src) ? mapped.src : pickGif(mapped.folder, current);
+    showGif(gifPath, () => {
+        prepareNext(mapped.folder, gifPath);
+        prepareNext("Start");  // idle is what usually comes after an emotion
+    });
 }
 
 function stopListening() {
@@ -251,8 +358,11 @@ function setInputAndSend(text) {
 
 // Expose functions to Python
 window.updateResponse = updateResponse;
+window.appendResponse = appendResponse;
+window.endResponse = endResponse;
 window.updateEmotion = updateEmotion;
 window.stopListening = stopListening;
 window.startSpeaking = startSpeaking;
 window.stopSpeaking = stopSpeaking;
 window.setInputAndSend = setInputAndSend;
+window.setAssetManifest = setAssetManifest;
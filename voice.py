@@ -0,0 +1,428 @@
+import collections
+import importlib.util
+import json
+import os
+import queue
+import threading
+import time
+import wave
+
+from config import (STT_BACKEND, VOSK_MODEL_PATH, WHISPER_MODEL, STT_TRANSCRIPT_PATH, STT_LANGUAGE,
+                    MIC_SAMPLE_RATE, VAD_FRAME_MS, VAD_START_RATIO, VAD_MIN_ENERGY, VAD_SILENCE_MS,
+                    VAD_PREROLL_MS, LISTEN_TIMEOUT, PHRASE_TIME_LIMIT)
+
+
+def _rms(frame):
+    import numpy as np
+    samples = np.frombuffer(frame, dtype="<i2").astype(np.float32)
+    return float(np.sqrt(np.mean(samples * samples))) if samples.size else 0.0
+
+
+# ──────────────────────────────────────────────
+# 🎙 Audio sources (mono 16-bit PCM, fixed-size frames)
+# ──────────────────────────────────────────────
+class MicrophoneSource:
+    """
+    Microphone opened once and kept open. Uses sounddevice when installed,
+    otherwise PyAudio (already needed by SpeechRecognition).
+    """
+    live = True
+
+    def __init__(self, rate=MIC_SAMPLE_RATE, frame_ms=VAD_FRAME_MS, device=None):
+        self.rate = rate
+        self.frame_samples = int(rate * frame_ms / 1000)
+        self.device = device
+        self._frames = queue.Queue(maxsize=200)
+        self._stream = None
+        self._pa = None
+
+    def open(self):
+        if self._stream is not None:
+            return self
+        try:
+            import sounddevice
+            self._stream = sounddevice.RawInputStream(
+                samplerate=self.rate, blocksize=self.frame_samples, channels=1,
+                dtype="int16", device=self.device, callback=self._on_audio,
+            )
+            self._stream.start()
+        except ImportError:
+            import pyaudio
+            self._pa = pyaudio.PyAudio()
+            self._stream = self._pa.open(
+                format=pyaudio.paInt16, channels=1, rate=self.rate, input=True,
+                frames_per_buffer=self.frame_samples, input_device_index=self.device,
+            )
+        return self
+
+    def _on_audio(self, data, frames, time_info, status):
+        try:
+            self._frames.put_nowait(bytes(data))
+        except queue.Full:
+            pass  # nobody is reading; dropping old audio is fine
+
+    def read(self, timeout=0.5):
+        if self._pa is not None:
+            return self._stream.read(self.frame_samples, exception_on_overflow=False)
+        try:
+            return self._frames.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        stream, self._stream = self._stream, None
+        try:
+            if stream is not None:
+                if self._pa is not None:
+                    stream.stop_stream()
+                stream.close()
+            if self._pa is not None:
+                self._pa.terminate()
+                self._pa = None
+        except Exception as e:
+            print(f"[Mic Error] {e}")
+
+
+class WavFileSource:
+    """Frames from a WAV file instead of the mic (offline runs, benchmarks)."""
+    live = False
+
+    def __init__(self, path, frame_ms=VAD_FRAME_MS):
+        self.path = path
+        self.frame_ms = frame_ms
+        self._wav = None
+        self.rate = None
+        self.frame_samples = None
+
+    def open(self):
+        self._wav = wave.open(self.path, "rb")
+        if self._wav.getsampwidth() != 2 or self._wav.getnchannels() != 1:
+            raise ValueError(f"{self.path}: expected mono 16-bit wav")
+        self.rate = self._wav.getframerate()
+        self.frame_samples = int(self.rate * self.frame_ms / 1000)
+        return self
+
+    def read(self, timeout=None):
+        """Next frame, or None at the end of the file."""
+        if self._wav is None:
+            return None
+        frame = self._wav.readframes(self.frame_samples)
+        return frame or None
+
+    def close(self):
+        if self._wav is not None:
+            self._wav.close()
+            self._wav = None
+
+
+# ──────────────────────────────────────────────
+# 🔉 Voice activity detection
+# ──────────────────────────────────────────────
+class EnergyVAD:
+    """
+    Energy detector with an adaptive noise floor: a frame is speech when
+    its RMS is `ratio` times the floor (and above `min_energy`). The floor
+    is an EMA over non-speech frames, so it follows the room without a
+    fresh calibration per utterance.
+    """
+
+    def __init__(self, ratio=VAD_START_RATIO, min_energy=VAD_MIN_ENERGY, alpha=0.05):
+        self.ratio = ratio
+        self.min_energy = min_energy
+        self.alpha = alpha
+        self.noise = None
+
+    @property
+    def calibrated(self):
+        return self.noise is not None
+
+    @property
+    def threshold(self):
+        return max(self.min_energy, (self.noise or 0.0) * self.ratio)
+
+    def observe_noise(self, energy):
+        if self.noise is None:
+            self.noise = energy
+        else:
+            self.noise += self.alpha * (energy - self.noise)
+
+    def is_speech(self, energy):
+        return energy >= self.threshold
+
+
+# ──────────────────────────────────────────────
+# 📝 Recognizers: transcribe(pcm, rate) -> text
+# ──────────────────────────────────────────────
+class GoogleRecognizer:
+    """Cloud recognizer from SpeechRecognition (the original behaviour)."""
+    name = "google"
+
+    def __init__(self, language=STT_LANGUAGE):
+        import speech_recognition as sr
+        self.sr = sr
+        self.recognizer = sr.Recognizer()
+        self.language = language
+
+    def transcribe(self, pcm, rate):
+        audio = self.sr.AudioData(pcm, rate, 2)
+        try:
+            return self.recognizer.recognize_google(audio, language=self.language)
+        except self.sr.UnknownValueError:
+            return ""
+
+
+class VoskRecognizer:
+    """Offline Kaldi recognizer; model folder from https://alphacephei.com/vosk/models."""
+    name = "vosk"
+
+    def __init__(self, model_path=VOSK_MODEL_PATH):
+        if not os.path.isdir(model_path):
+            raise RuntimeError(f"Vosk model not found at {model_path}")
+        from vosk import Model, SetLogLevel
+        SetLogLevel(-1)
+        self.model = Model(model_path)
+
+    def transcribe(self, pcm, rate):
+        from vosk import KaldiRecognizer
+        rec = KaldiRecognizer(self.model, rate)
+        rec.AcceptWaveform(pcm)
+        return json.loads(rec.FinalResult()).get("text", "")
+
+
+class WhisperRecognizer:
+    """Offline Whisper via faster-whisper (int8 on CPU)."""
+    name = "whisper"
+
+    def __init__(self, model_size=WHISPER_MODEL, language=STT_LANGUAGE):
+        from faster_whisper import WhisperModel
+        self.model = WhisperModel(model_size, device="cpu", compute_type="int8")
+        self.language = (language or "").split("-")[0] or None
+
+    def transcribe(self, pcm, rate):
+        import numpy as np
+        audio = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+        if rate != 16000:
+            # Whisper expects 16 kHz
+            n = int(len(audio) * 16000 / rate)
+            audio = np.interp(np.linspace(0, len(audio) - 1, n), np.arange(len(audio)), audio).astype(np.float32)
+        segments, _ = self.model.transcribe(audio, language=self.language, beam_size=1, vad_filter=False)
+        return " ".join(s.text.strip() for s in segments).strip()
+
+
+class TranscriptRecognizer:
+    """
+    Stand-in recognizer: returns the lines of a text file one per utterance
+    (cycling), ignoring the audio. Lets the voice path run without a model.
+    """
+    name = "file"
+
+    def __init__(self, path=STT_TRANSCRIPT_PATH):
+        with open(path, encoding="utf-8") as f:
+            self.lines = [line.strip() for line in f if line.strip()]
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def transcribe(self, pcm, rate):
+        with self._lock:
+            if not self.lines:
+                return ""
+            text = self.lines[self._next % len(self.lines)]
+            self._next += 1
+            return text
+
+
+RECOGNIZERS = {
+    "google": GoogleRecognizer,
+    "vosk": VoskRecognizer,
+    "whisper": WhisperRecognizer,
+    "file": TranscriptRecognizer,
+}
+
+
+def _auto_order():
+    order = []
+    if os.path.isdir(VOSK_MODEL_PATH) and importlib.util.find_spec("vosk"):
+        order.append("vosk")
+    if importlib.util.find_spec("faster_whisper"):
+        order.append("whisper")
+    order.append("google")
+    return order
+
+
+def get_recognizer(name=None):
+    """Recognizer from STT_BACKEND in config; 'auto' prefers offline ones."""
+    name = name or STT_BACKEND
+    order = _auto_order() if name == "auto" else [name]
+    errors = []
+    for candidate in order:
+        try:
+            return RECOGNIZERS[candidate]()
+        except Exception as e:
+            errors.append(f"{candidate}: {e}")
+    raise RuntimeError("No speech recognizer available (" + "; ".join(errors) + ")")
+
+
+# ──────────────────────────────────────────────
+# 🎧 Voice input service
+# ──────────────────────────────────────────────
+class NoSpeech(Exception):
+    """Nothing was said before the listen timeout."""
+
+
+class VoiceService:
+    """
+    Long-lived speech-to-text front end.
+    - the audio source is opened once; between turns a reader thread keeps
+      the noise floor current and fills a short pre-roll buffer
+    - listen() ends the utterance after VAD_SILENCE_MS of silence
+    - the recognizer is created once (models stay loaded)
+    """
+
+    def __init__(self, source=None, recognizer=None, silence_ms=VAD_SILENCE_MS, preroll_ms=VAD_PREROLL_MS,
+                 calibrate_ms=300):
+        self.source = source
+        self.recognizer = recognizer
+        self.vad = EnergyVAD()
+        self.silence_ms = silence_ms
+        self.preroll_ms = preroll_ms
+        self.calibrate_ms = calibrate_ms
+        self._preroll = None
+        self._frames = None
+        self._listening = threading.Event()
+        self._closed = threading.Event()
+        self._reader = None
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Open the source and load the recognizer (idempotent)."""
+        with self._lock:
+            if self._started:
+                return self
+            if self.source is None:
+                self.source = MicrophoneSource()
+            self.source.open()
+            if self.recognizer is None:
+                self.recognizer = get_recognizer()
+            frame_ms = self.source.frame_samples * 1000.0 / self.source.rate
+            self._frame_ms = frame_ms
+            self._preroll = collections.deque(maxlen=max(1, int(self.preroll_ms / frame_ms)))
+            if self.source.live:
+                self._reader = threading.Thread(target=self._read_loop, name="mic-reader", daemon=True)
+                self._reader.start()
+            self._started = True
+        return self
+
+    def _read_loop(self):
+        while not self._closed.is_set():
+            try:
+                frame = self.source.read(timeout=0.5)
+            except Exception as e:
+                print(f"[Mic Error] {e}")
+                time.sleep(0.5)
+                continue
+            if frame is None:
+                continue
+            if self._listening.is_set():
+                self._frames.put(frame)
+                continue
+            # Idle: keep the noise floor and pre-roll up to date
+            energy = _rms(frame)
+            if not self.vad.is_speech(energy):
+                self.vad.observe_noise(energy)
+            self._preroll.append(frame)
+
+    def _next_frame(self, timeout):
+        if self.source.live:
+            try:
+                return self._frames.get(timeout=timeout)
+            except queue.Empty:
+                return None
+        return self.source.read()
+
+    def capture(self, timeout=LISTEN_TIMEOUT, phrase_time_limit=PHRASE_TIME_LIMIT, timings=None):
+        """
+        Block until one utterance was spoken; return its PCM bytes.
+        Raises NoSpeech if nothing starts within `timeout` seconds.
+        """
+        self.start()
+        self._frames = queue.Queue()
+        voiced = list(self._preroll)
+        self._preroll.clear()
+        self._listening.set()
+        started_at = time.perf_counter()
+        try:
+            if not self.vad.calibrated:
+                # First use only: learn the room noise before listening
+                t = time.perf_counter()
+                needed = max(1, int(self.calibrate_ms / self._frame_ms))
+                while needed > 0:
+                    frame = self._next_frame(0.5)
+                    if frame is None:
+                        if not self.source.live:
+                            break
+                        continue
+                    self.vad.observe_noise(_rms(frame))
+                    needed -= 1
+                voiced = []
+                if timings is not None:
+                    timings.append(("stt.calibrate", t, time.perf_counter()))
+                started_at = time.perf_counter()
+
+            t = time.perf_counter()
+            in_speech = False
+            silence = 0.0
+            speech_ms = 0.0
+            while True:
+                frame = self._next_frame(0.1)
+                now = time.perf_counter()
+                if frame is None:
+                    if not self.source.live:
+                        break  # end of file ends the utterance
+                    if not in_speech and now - started_at > timeout:
+                        raise NoSpeech("no speech detected")
+                    continue
+                energy = _rms(frame)
+                if self.vad.is_speech(energy):
+                    in_speech = True
+                    silence = 0.0
+                else:
+                    if not in_speech:
+                        self.vad.observe_noise(energy)
+                    silence += self._frame_ms
+                voiced.append(frame)
+                if in_speech:
+                    speech_ms += self._frame_ms
+                    if silence >= self.silence_ms or speech_ms >= phrase_time_limit * 1000:
+                        break
+                else:
+                    del voiced[:-self._preroll.maxlen]
+                    if now - started_at > timeout:
+                        raise NoSpeech("no speech detected")
+            if not in_speech:
+                raise NoSpeech("no speech detected")
+            if timings is not None:
+                timings.append(("stt.capture", t, time.perf_counter()))
+            return b"".join(voiced)
+        finally:
+            self._listening.clear()
+
+    def listen(self, timeout=LISTEN_TIMEOUT, phrase_time_limit=PHRASE_TIME_LIMIT):
+        """Capture one utterance and transcribe it. Returns (text, timings)."""
+        timings = []
+        pcm = self.capture(timeout, phrase_time_limit, timings)
+        t = time.perf_counter()
+        text = self.recognizer.transcribe(pcm, self.source.rate)
+        timings.append(("stt.recognize", t, time.perf_counter()))
+        return (text or "").strip(), timings
+
+    def close(self):
+        self._closed.set()
+        if self._reader is not None:
+            self._reader.join(timeout=1.0)
+            self._reader = None
+        if self.source is not None:
+            self.source.close()
+
+
+VOICE = VoiceService()